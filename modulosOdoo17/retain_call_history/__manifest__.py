@@ -8,7 +8,7 @@ Este módulo fue creado como práctica para aprender desarrollo en Odoo 17.
     'author': "Edwin Camilo Valencia Bustamante",
     'website': "https://www.tusitio.com",
     'category': 'Tools',
-    'version': '0.1',
+    'version': '0.2',
     'depends': ['base', 'web'],
     'data': [
         'security/groups.xml',
@@ -19,6 +19,12 @@ Este módulo fue creado como práctica para aprender desarrollo en Odoo 17.
         'views/llamada_views.xml',
         'views/llamada_trash_views.xml',
         'views/llamada_settings_views.xml',
+        'views/llamada_sync_job_views.xml',
+        'views/llamada_webhook_event_views.xml',
+        'views/llamada_daily_stats_views.xml',
+        'views/llamada_agent_views.xml',
+        'views/llamada_export_views.xml',
+        'views/llamada_archive_views.xml',
     'views/templates.xml',
     ],
     'demo': [
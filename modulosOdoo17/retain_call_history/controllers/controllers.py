@@ -1,22 +1,86 @@
 # -*- coding: utf-8 -*-
-# from odoo import http
+import odoo
+from odoo import api, http
+from odoo.http import request
+import json
+import logging
+import os
 
+from ..models.llamada_export import EXPORT_MIMETYPES, EXPORT_STREAM_BLOCK_SIZE
+from ..models.llamada_webhook_event import WEBHOOK_EVENTS
 
-# class Prueba(http.Controller):
-#     @http.route('/prueba/prueba', auth='public')
-#     def index(self, **kw):
-#         return "Hello, world"
+_logger = logging.getLogger(__name__)
 
-#     @http.route('/prueba/prueba/objects', auth='public')
-#     def list(self, **kw):
-#         return http.request.render('prueba.listing', {
-#             'root': '/prueba/prueba',
-#             'objects': http.request.env['prueba.prueba'].search([]),
-#         })
 
-#     @http.route('/prueba/prueba/objects/<model("prueba.prueba"):obj>', auth='public')
-#     def object(self, obj, **kw):
-#         return http.request.render('prueba.object', {
-#             'object': obj
-#         })
+class RetellWebhook(http.Controller):
 
+    # Recibe los webhooks de Retell (call_started, call_ended, call_analyzed).
+    # Sólo valida la firma y encola el evento: Retell espera respuesta en pocos segundos.
+    @http.route('/retain_call_history/retell/webhook', type='http', auth='public', methods=['POST'], csrf=False)
+    def retell_webhook(self, **kw):
+        Event = request.env['retain.call.webhook.event'].sudo()
+        if not Event._get_webhook_secret():
+            _logger.warning("Webhook de Retell rechazado: no hay secreto ni API key configurados")
+            return request.make_response('Webhook no configurado', status=503)
+        body = request.httprequest.get_data()
+        if not Event._verify_signature(body, request.httprequest.headers.get('x-retell-signature')):
+            _logger.warning("Webhook de Retell rechazado: firma no válida")
+            return request.make_response('Firma no válida', status=401)
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return request.make_response('JSON no válido', status=400)
+        event_type = data.get('event')
+        call_data = data.get('call') or {}
+        if event_type not in WEBHOOK_EVENTS or not call_data.get('call_id'):
+            # Eventos que no nos interesan: se confirman para que Retell no los reintente
+            return request.make_response('', status=204)
+        Event._enqueue(event_type, call_data)
+        return request.make_response('', status=204)
+
+
+class RetainCallExportController(http.Controller):
+
+    # Descarga en streaming una exportación (retain.call.export). CSV y JSONL se envían
+    # bloque a bloque según se leen de la base de datos; Parquet se genera en un fichero
+    # temporal y se envía por bloques. La memoria usada no depende del número de llamadas.
+    @http.route('/retain_call_history/export/<int:export_id>', type='http', auth='user')
+    def download_export(self, export_id, **kw):
+        export = request.env['retain.call.export'].browse(export_id).exists()
+        if not export:
+            return request.not_found()
+        export.check_access_rule('read')
+        headers = [
+            ('Content-Type', EXPORT_MIMETYPES[export.export_format]),
+            ('Content-Disposition', http.content_disposition(export.name)),
+        ]
+        # El cursor de la petición se cierra al devolver la respuesta: el generador abre el suyo
+        dbname, uid, context = request.env.cr.dbname, request.env.uid, dict(request.env.context)
+
+        def generate():
+            with odoo.registry(dbname).cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                stream_export = env['retain.call.export'].browse(export_id)
+                if stream_export.export_format != 'parquet':
+                    yield from stream_export._iter_blocks()
+                    return
+                path = stream_export._write_file()[0]
+                try:
+                    with open(path, 'rb') as exported:
+                        yield from iter(lambda: exported.read(EXPORT_STREAM_BLOCK_SIZE), b'')
+                finally:
+                    os.unlink(path)
+
+        return request.make_response(generate(), headers=headers)
+
+    # Descarga una sola llamada como texto (número, datos, descripción y transcripción)
+    @http.route('/retain_call_history/call/<int:call_id>/download', type='http', auth='user')
+    def download_call(self, call_id, **kw):
+        llamada = request.env['retain.call.history'].browse(call_id).exists()
+        if not llamada:
+            return request.not_found()
+        llamada.check_access_rule('read')
+        return request.make_response(llamada._get_download_text().encode('utf-8'), headers=[
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('Content-Disposition', http.content_disposition(f"llamada_{llamada.sequence}.txt")),
+        ])
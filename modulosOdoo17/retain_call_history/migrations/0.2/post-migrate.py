@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from odoo import api, SUPERUSER_ID
+
+
+# Migraciones de una sola vez al pasar a 0.2 (antes se ejecutaban en cada actualización)
+def migrate(cr, version):
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    # Traduce en bloque los motivos de desconexión guardados sin traducir
+    env['retain.call.history'].action_traducir_motivos_existentes()
+    # Las transcripciones comprimidas se guardaban en base64; ahora en bytes
+    env['retain.call.transcript']._migrate_base64_storage()
+    # Pasa las transcripciones de la antigua columna de texto al almacenamiento comprimido
+    env['retain.call.history']._migrate_legacy_transcriptions()
+    # Crea los agentes a partir del historial y pasa los ajustes a vínculos persona -> agente
+    env['retain.call.agent']._backfill_from_history()
+    env['llamada.settings']._migrate_agent_links()
+    # Reconstruye el resumen diario de llamadas
+    env['retain.call.daily.stats'].action_refresh_all()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo.tools import sql
+
+_logger = logging.getLogger(__name__)
+
+# Columnas de la papelera que no pueden quedar a NULL
+TRASH_REQUIRED_COLUMNS = ('name', 'phone')
+
+
+# Antes de crear la restricción unique(call_id) quita los call_id repetidos: se conserva
+# la llamada con el id más bajo y las demás pasan a la papelera. Se ejecuta antes de
+# cargar los modelos, así que todo va en SQL.
+def migrate(cr, version):
+    if not sql.table_exists(cr, 'retain_call_history'):
+        return
+    cr.execute("""
+        SELECT id FROM (
+            SELECT id, row_number() OVER (PARTITION BY call_id ORDER BY id) AS position
+              FROM retain_call_history
+             WHERE call_id IS NOT NULL
+        ) AS llamadas
+         WHERE position > 1
+    """)
+    duplicate_ids = tuple(row[0] for row in cr.fetchall())
+    if not duplicate_ids:
+        return
+    if sql.table_exists(cr, 'retain_call_history_trash'):
+        _copy_to_trash(cr, duplicate_ids)
+    cr.execute("DELETE FROM retain_call_history WHERE id IN %s", [duplicate_ids])
+    _logger.info(f"Eliminadas {len(duplicate_ids)} llamadas con call_id repetido antes de la restricción única")
+
+
+# Copia a la papelera las columnas que existen en ambas tablas
+def _copy_to_trash(cr, record_ids):
+    trash_columns = _table_columns(cr, 'retain_call_history_trash')
+    columns = sorted((_table_columns(cr, 'retain_call_history') & trash_columns) - {'id', 'deletion_date'})
+    select = [
+        f'COALESCE("{column}", \'\')' if column in TRASH_REQUIRED_COLUMNS else f'"{column}"'
+        for column in columns
+    ]
+    if 'deletion_date' in trash_columns:
+        columns.append('deletion_date')
+        select.append("now() at time zone 'UTC'")
+    cr.execute(
+        f"""INSERT INTO retain_call_history_trash ({', '.join(f'"{c}"' for c in columns)})
+            SELECT {', '.join(select)} FROM retain_call_history WHERE id IN %s""",
+        [record_ids],
+    )
+
+
+def _table_columns(cr, table):
+    cr.execute("""
+        SELECT column_name FROM information_schema.columns
+         WHERE table_schema = current_schema() AND table_name = %s
+    """, [table])
+    return {row[0] for row in cr.fetchall()}
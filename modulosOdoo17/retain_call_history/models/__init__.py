@@ -3,3 +3,11 @@
 from . import llamada
 from . import llamada_trash
 from . import llamada_settings
+from . import llamada_sync_job
+from . import llamada_sync_state
+from . import llamada_transcript
+from . import llamada_webhook_event
+from . import llamada_daily_stats
+from . import llamada_agent
+from . import llamada_export
+from . import llamada_archive
@@ -1,15 +1,145 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import UserError
-from datetime import datetime
-import base64
+from odoo.tools import sql
+from datetime import datetime, timedelta
+import hashlib
 import requests
 import logging
 import re
 import json
+import time
+import tracemalloc
+
+from .retell_client import RetellClient
 
 _logger = logging.getLogger(__name__)
 
+# Parámetros de sincronización incremental (ir.config_parameter). La marca de agua y el
+# punto de reanudación se guardan en retain.call.sync.state
+SYNC_OVERLAP_PARAM = 'retain_call_history.sync_overlap_minutes'
+SYNC_OVERLAP_DEFAULT = 60
+RETELL_PAGE_SIZE = 1000
+SYNC_BATCH_SIZE = 500
+# Se incluye en la huella: cambiarlo obliga a reprocesar todas las llamadas
+# (p. ej. si cambia la forma de convertir el payload de Retell en valores)
+PAYLOAD_HASH_VERSION = '1'
+# Etapas que se miden en cada sincronización (retain.call.sync.job)
+SYNC_STAGES = ('fetch', 'process', 'upsert', 'enrich')
+
+# Cliente HTTP de Retell (/v2/list-calls y /v2/get-call). Con la URL base y la API key
+# en parámetros, la sincronización puede apuntar a un simulador local de Retell
+RETELL_API_KEY_PARAM = 'retain_call_history.retell_api_key'
+RETELL_BASE_URL_PARAM = 'retain_call_history.retell_base_url'
+RETELL_CONNECT_TIMEOUT_PARAM = 'retain_call_history.retell_connect_timeout'
+RETELL_READ_TIMEOUT_PARAM = 'retain_call_history.retell_read_timeout'
+RETELL_MAX_RETRIES_PARAM = 'retain_call_history.retell_max_retries'
+RETELL_CIRCUIT_THRESHOLD_PARAM = 'retain_call_history.retell_circuit_threshold'
+RETELL_CIRCUIT_COOLDOWN_PARAM = 'retain_call_history.retell_circuit_cooldown'
+DETAIL_CONCURRENCY_PARAM = 'retain_call_history.detail_concurrency'
+DETAIL_RATE_LIMIT_PARAM = 'retain_call_history.detail_rate_limit'
+DETAIL_BATCH_SIZE = 200
+ENRICHMENT_RETRY_DAYS_PARAM = 'retain_call_history.enrichment_retry_days'
+ENRICHMENT_RETRY_DAYS_DEFAULT = 7
+
+# Estados de llamada de Retell (compartidos con la papelera)
+CALL_STATUS_SELECTION = [('pending', 'Pendiente'),('registered', 'Iniciando'),('ongoing', 'Activa'),('ended', 'Finalizada'),('not_connected', 'Sin conexión'),
+    ('invalid_destination', 'Destino inválido'),('telephony_provider_permission_denied', 'Permiso denegado'),('telephony_provider_unavailable', 'Proveedor no disp.'),
+    ('sip_routing_error', 'Error de ruta'),('marked_as_spam', 'Spam'),('user_declined', 'Rechazada'),
+]
+CALL_STATUS_VALUES = frozenset(value for value, _label in CALL_STATUS_SELECTION)
+# status_var es el estado de Retell salvo 'pending'
+STATUS_VAR_SELECTION = [item for item in CALL_STATUS_SELECTION if item[0] != 'pending']
+STATUS_VAR_VALUES = frozenset(value for value, _label in STATUS_VAR_SELECTION)
+
+# Claves donde Retell puede traer el nombre del agente, por orden de preferencia
+AGENT_NAME_KEYS = (
+    'agent_name', 'agent', 'assistant_name', 'assistant',
+    'agent_id', 'assistant_id', 'bot_name', 'bot_id',
+    'voice_agent', 'ai_agent', 'virtual_agent',
+)
+# Campos que se copian tal cual del payload de Retell: campo -> ruta en el JSON (claves
+# separadas por puntos). En el parámetro CALL_FIELD_MAP_PARAM se puede guardar un JSON con
+# el mismo formato para añadir o cambiar campos sin tocar el código.
+CALL_FIELD_MAP_PARAM = 'retain_call_history.call_field_map'
+CALL_FIELD_MAP_DEFAULT = {
+    'direction': 'direction',
+    'from_number': 'from_number',
+    'to_number': 'to_number',
+    'description_llamada': 'call_analysis.call_summary',
+}
+# Campos que _process_call_data calcula por su cuenta y que el mapeo no puede sobrescribir
+CALL_FIELD_MAP_RESERVED = (
+    'call_id', 'name', 'phone', 'call_status', 'call_date', 'duration', 'duration_ms',
+    'agent_name', 'disconnection_reason', 'transcription', 'transcript_turns', 'payload_hash',
+)
+
+# Traducción al español de los motivos de desconexión de Retell
+DISCONNECTION_REASON_MAP = {
+    'user_hangup': 'El usuario colgó',
+    'agent_hangup': 'El agente colgó',
+    'call_transfer': 'Llamada transferida a otro destino',
+    'voicemail_reached': 'Se llegó al buzón de voz',
+    'inactivity': 'Llamada finalizada por inactividad',
+    'max_duration_reached': 'Tiempo máximo de llamada alcanzado',
+    'concurrency_limit_reached': 'Límite de llamadas simultáneas alcanzado',
+    'no_valid_payment': 'Llamada cancelada por falta de pago válido',
+    'scam_detected': 'Llamada finalizada por detección de posible estafa',
+    'dial_busy': 'El número estaba ocupado',
+    'dial_failed': 'Error al intentar marcar el número',
+    'dial_no_answer': 'El número no respondió',
+    'invalid_destination': 'Destino inválido',
+    'telephony_provider_permission_denied': 'Permiso denegado por el proveedor de telefonía',
+    'telephony_provider_unavailable': 'Proveedor de telefonía no disponible',
+    'sip_routing_error': 'Error de enrutamiento SIP',
+    'marked_as_spam': 'Llamada marcada como spam',
+    'user_declined': 'El usuario rechazó la llamada',
+    'error_llm_websocket_open': 'Error al abrir la conexión WebSocket del modelo IA',
+    'error_llm_websocket_lost_connection': 'Conexión WebSocket con el modelo IA perdida',
+    'error_llm_websocket_runtime': 'Error de ejecución en WebSocket del modelo IA',
+    'error_llm_websocket_corrupt_payload': 'Paquete de datos corrupto en WebSocket del modelo IA',
+    'error_no_audio_received': 'No se recibió audio durante la llamada',
+    'error_asr': 'Error en el reconocimiento de voz (ASR)',
+    'error_retell': 'Error interno del sistema Retell',
+    'error_unknown': 'Error desconocido',
+    'error_user_not_joined': 'El usuario no se unió a la llamada',
+    'registered_call_timeout': 'Tiempo de espera agotado al registrar la llamada',
+    'timeout': 'Tiempo agotado',
+    'network_error': 'Error de red',
+    'busy': 'Ocupado',
+    'no_answer': 'Sin respuesta',
+    'rejected': 'Rechazada',
+    'completed': 'Completada',
+    'unknown': 'Desconocido',
+}
+
+# Campos de texto que se normalizan con _clean_text_formatting al guardar
+CLEAN_TEXT_FIELDS = ('transcription', 'description_llamada')
+# Campos que sólo trae completos /v2/get-call: un valor vacío de /v2/list-calls no borra
+# lo que ya completó el enriquecimiento
+ENRICHED_FIELDS = ('transcription', 'transcript_turns', 'agent_name')
+# Secuencias de escape literales que llegan de Retell, en el orden en que se sustituyen
+# (tras '\\n' ya no puede quedar ningún '\\r\\n', así que '\\r\\n' acaba como dos saltos)
+CLEAN_TEXT_ESCAPES = (('\\n', '\n'), ('\\r', '\n'), ('\\t', '    '), ('\\"', '"'), ('\\/', '/'))
+CLEAN_TEXT_BLANK_LINES_RE = re.compile(r'\n{3,}')
+CLEAN_TEXT_TRAILING_SPACE_RE = re.compile(r'[^\S\n]\n')
+# Tamaño de lote para copiar, mover o borrar registros en bloque
+BATCH_SIZE = 1000
+
+# Búsqueda de texto completo (PostgreSQL) sobre transcripciones y resúmenes
+FULLTEXT_CONFIG = 'spanish'
+FULLTEXT_DESCRIPTION_VECTOR = f"to_tsvector('{FULLTEXT_CONFIG}', coalesce(description_llamada, ''))"
+FULLTEXT_HEADLINE_OPTIONS = 'MaxWords=35, MinWords=15, MaxFragments=2, StartSel=<b>, StopSel=</b>'
+FULLTEXT_RESULT_LIMIT = 80
+
+# Lee los registros en bloque como lista de valores para create() en otro modelo
+# (historial <-> papelera)
+def read_for_copy(records, field_names):
+    return [
+        {name: value for name, value in row.items() if name != 'id'}
+        for row in records.read(list(field_names), load=False)
+    ]
+
 class RetainCallHistory(models.Model):
     _name = 'retain.call.history'
     _description = 'Historial de Llamadas'
@@ -18,16 +148,9 @@ class RetainCallHistory(models.Model):
     sequence = fields.Char(string='Número de Llamada', required=True, readonly=True, default='Nuevo')
     name = fields.Char(string='Nombre del Contacto', required=True, default='Sin nombre')
     phone = fields.Char(string='Teléfono', required=True)
-    call_status = fields.Selection([('pending', 'Pendiente'),('registered', 'Iniciando'),('ongoing', 'Activa'),('ended', 'Finalizada'),('not_connected', 'Sin conexión'),
-        ('invalid_destination', 'Destino inválido'),('telephony_provider_permission_denied', 'Permiso denegado'),('telephony_provider_unavailable', 'Proveedor no disp.'),
-        ('sip_routing_error', 'Error de ruta'),('marked_as_spam', 'Spam'),('user_declined', 'Rechazada'),
-    ], string='Estado', default='pending')
-    status_var = fields.Selection([
-        ('registered', 'Iniciando'),('ongoing', 'Activa'),('ended', 'Finalizada'),('not_connected', 'Sin conexión'),('invalid_destination', 'Destino inválido'),
-        ('telephony_provider_permission_denied', 'Permiso denegado'),('telephony_provider_unavailable', 'Proveedor no disp.'),
-        ('sip_routing_error', 'Error de ruta'),('marked_as_spam', 'Spam'),('user_declined', 'Rechazada'),
-    ], string='Estado de proceso', compute='_compute_status_var', store=True)
-    call_date = fields.Datetime(string='Fecha y hora de la llamada')
+    call_status = fields.Selection(CALL_STATUS_SELECTION, string='Estado', default='pending')
+    status_var = fields.Selection(STATUS_VAR_SELECTION, string='Estado de proceso', compute='_compute_status_var', store=True)
+    call_date = fields.Datetime(string='Fecha y hora de la llamada', index=True)
     duration = fields.Float(string='Duración (minutos)')
     duration_ms = fields.Integer(string='Duración (ms)')
     direction = fields.Selection([
@@ -37,11 +160,231 @@ class RetainCallHistory(models.Model):
     from_number = fields.Char(string='Número origen')
     to_number = fields.Char(string='Número destino')
     agent_name = fields.Char(string='Nombre del agente')
+    # Se rellena a partir de agent_name al crear o escribir
+    agent_id = fields.Many2one('retain.call.agent', string='Agente', readonly=True, index=True, ondelete='set null')
     disconnection_reason = fields.Char(string='Motivo de desconexión')
     call_id = fields.Char(string='ID de Llamada Retell', readonly=True)
     description_llamada = fields.Text(string='Descripción de la llamada')
-    transcription = fields.Text(string='Transcripción de la llamada')
+    # La transcripción se guarda comprimida en retain.call.transcript para que la fila
+    # principal sea pequeña; aquí se expone como texto y se descomprime bajo demanda
+    transcription = fields.Text(string='Transcripción de la llamada', compute='_compute_transcription',
+                                inverse='_inverse_transcription', search='_search_transcription')
+    transcript_turns = fields.Json(string='Turnos de la transcripción', compute='_compute_transcript_turns',
+                                   inverse='_inverse_transcript_turns')
+    transcript_ids = fields.One2many('retain.call.transcript', 'call_history_id', string='Transcripción comprimida')
+    has_transcription = fields.Boolean(string='Tiene transcripción', readonly=True, copy=False)
+    fulltext = fields.Char(string='Texto de la llamada', compute='_compute_fulltext', search='_search_fulltext')
     editable = fields.Boolean(string='Editable', default=True)
+    enrichment_attempted_at = fields.Datetime(string='Detalles consultados el', readonly=True, copy=False)
+    payload_hash = fields.Char(string='Huella del payload de Retell', readonly=True, copy=False)
+
+    _sql_constraints = [
+        ('call_id_unique', 'unique(call_id)', 'Ya existe una llamada con este ID de Retell.'),
+    ]
+
+    # Índices para los filtros de la barra (agente + rango de fechas) y para las
+    # búsquedas de datos incompletos de la sincronización (índices parciales)
+    def init(self):
+        sql.create_index(self.env.cr, 'retain_call_history_agent_date_index', self._table,
+                         ['agent_name', 'call_date'])
+        # Para encontrar los días modificados al refrescar el resumen diario
+        sql.create_index(self.env.cr, 'retain_call_history_write_date_index', self._table, ['write_date'])
+        sql.create_index(self.env.cr, 'retain_call_history_description_fts_index', self._table,
+                         [FULLTEXT_DESCRIPTION_VECTOR], method='gin')
+        sql.create_index(self.env.cr, 'retain_call_history_no_transcription_index', self._table,
+                         ['enrichment_attempted_at'], where="has_transcription IS NULL OR has_transcription = false")
+        sql.create_index(self.env.cr, 'retain_call_history_missing_agent_index', self._table,
+                         ['enrichment_attempted_at'], where="agent_name IS NULL OR agent_name = ''")
+
+    @api.depends('transcript_ids.text_data', 'transcript_ids.turns_data')
+    def _compute_transcription(self):
+        for record in self:
+            transcript = record.transcript_ids[:1]
+            record.transcription = transcript.get_text() if transcript else False
+
+    @api.depends('transcript_ids.turns_data')
+    def _compute_transcript_turns(self):
+        for record in self:
+            transcript = record.transcript_ids[:1]
+            record.transcript_turns = transcript.get_turns() if transcript else False
+
+    # Guarda en retain.call.transcript el texto o los turnos (comprimidos) de cada llamada
+    def _store_transcripts(self, values, kind):
+        Transcript = self.env['retain.call.transcript']
+        # Se busca en vez de leer transcript_ids: el otro inverse puede haberla creado ya
+        existing = {t.call_history_id.id: t for t in Transcript.search([('call_history_id', 'in', self.ids)])}
+        to_create = []
+        empty = self.browse()
+        for record in self:
+            value = values[record.id]
+            transcript = existing.get(record.id, Transcript)
+            if kind == 'text':
+                vals = Transcript._prepare_storage_vals(text=value or '', codec=transcript.codec)
+                if not value:
+                    empty |= record
+            else:
+                vals = Transcript._prepare_storage_vals(turns=value or [], codec=transcript.codec)
+            if transcript:
+                transcript.write(vals)
+            elif value:
+                to_create.append(dict(vals, call_history_id=record.id))
+        if to_create:
+            Transcript.create(to_create)
+        if kind == 'text':
+            (self - empty).filtered(lambda r: not r.has_transcription).write({'has_transcription': True})
+            empty.filtered('has_transcription').write({'has_transcription': False})
+            # Sin texto ni turnos no tiene sentido conservar la fila comprimida
+            Transcript.browse([existing[r.id].id for r in empty if r.id in existing]).filtered(lambda t: not t.turns_data).unlink()
+
+    def _inverse_transcription(self):
+        self._store_transcripts({record.id: record.transcription for record in self}, 'text')
+
+    def _inverse_transcript_turns(self):
+        self._store_transcripts({record.id: record.transcript_turns for record in self}, 'turns')
+
+    def _search_transcription(self, operator, value):
+        # El contenido está comprimido: la presencia se busca por has_transcription
+        # y el texto con el índice de texto completo de retain.call.transcript
+        if operator in ('=', '!=') and not value:
+            return [('has_transcription', '=' if operator == '!=' else '!=', True)]
+        if operator in ('ilike', 'like', '=ilike', '=like') and value:
+            return [('id', 'in', self._fulltext_match_query(value, description=False))]
+        raise UserError("La transcripción sólo se puede buscar por contenido (contiene) o por presencia.")
+
+    def _compute_fulltext(self):
+        self.fulltext = False
+
+    def _search_fulltext(self, operator, value):
+        if operator not in ('ilike', 'like', '=') or not value:
+            raise UserError("La búsqueda de texto sólo admite el operador 'contiene'.")
+        return [('id', 'in', self._fulltext_match_query(value))]
+
+    # Query (subconsulta de ids) de las llamadas cuyo resumen o transcripción coinciden con la
+    # consulta. Los dominios la usan tal cual: la base de datos resuelve la búsqueda sin pasar
+    # los ids por Python, aunque coincidan cientos de miles de llamadas.
+    @api.model
+    def _fulltext_match_query(self, query, description=True):
+        subquery, params = self.env['retain.call.transcript']._fulltext_match_subquery(query)
+        if description:
+            self.flush_model(['description_llamada'])
+            subquery = f"""
+                SELECT id
+                  FROM retain_call_history
+                 WHERE {FULLTEXT_DESCRIPTION_VECTOR} @@ websearch_to_tsquery('{FULLTEXT_CONFIG}', %s)
+                 UNION
+                {subquery}
+            """
+            params = [query] + params
+        matches = self._search([])
+        matches.add_where(f'"{self._table}".id IN ({subquery})', params)
+        return matches
+
+    # Ids y relevancia de las llamadas cuyo resumen o transcripción coinciden con la consulta
+    # (sintaxis de buscador web: palabras, "frases exactas", OR y -exclusiones)
+    @api.model
+    def _fulltext_match(self, query, limit=None):
+        self.env['retain.call.transcript'].flush_model(['call_history_id'])
+        self.flush_model(['description_llamada'])
+        self.env.cr.execute(f"""
+            WITH q AS (SELECT websearch_to_tsquery('{FULLTEXT_CONFIG}', %(query)s) AS query)
+            SELECT matches.id, sum(matches.rank) AS rank
+              FROM (
+                    SELECT h.id, ts_rank({FULLTEXT_DESCRIPTION_VECTOR}, q.query) AS rank
+                      FROM retain_call_history h, q
+                     WHERE {FULLTEXT_DESCRIPTION_VECTOR} @@ q.query
+                    UNION ALL
+                    SELECT t.call_history_id, ts_rank(t.search_vector, q.query)
+                      FROM retain_call_transcript t, q
+                     WHERE t.search_vector @@ q.query
+                   ) AS matches
+          GROUP BY matches.id
+          ORDER BY rank DESC, matches.id DESC
+             LIMIT %(limit)s
+        """, {'query': query, 'limit': limit})
+        return self.env.cr.fetchall()
+
+    # Búsqueda de texto completo con resultados ordenados por relevancia y fragmentos resaltados
+    @api.model
+    def fulltext_search(self, query, limit=FULLTEXT_RESULT_LIMIT):
+        query = (query or '').strip()
+        if not query:
+            return []
+        ranks = dict(self._fulltext_match(query, limit=limit))
+        # search() aplica los permisos del usuario sobre los ids encontrados
+        llamadas = self.search([('id', 'in', list(ranks))])
+        llamadas = llamadas.sorted(lambda llamada: (ranks[llamada.id], llamada.id), reverse=True)
+        description_snippets = self._fulltext_headlines(query, {l.id: l.description_llamada for l in llamadas})
+        transcription_snippets = self._fulltext_headlines(query, {l.id: l.transcription for l in llamadas})
+        return [{
+            'id': llamada.id,
+            'sequence': llamada.sequence,
+            'call_id': llamada.call_id,
+            'agent_name': llamada.agent_name,
+            'call_date': fields.Datetime.to_string(llamada.call_date),
+            'rank': ranks[llamada.id],
+            'description_snippet': description_snippets.get(llamada.id, ''),
+            'transcription_snippet': transcription_snippets.get(llamada.id, ''),
+        } for llamada in llamadas]
+
+    # Fragmentos con las coincidencias resaltadas (<b>) calculados por PostgreSQL en una consulta
+    @api.model
+    def _fulltext_headlines(self, query, texts):
+        texts = {key: text for key, text in texts.items() if text}
+        if not texts:
+            return {}
+        self.env.cr.execute(f"""
+            SELECT v.id, ts_headline('{FULLTEXT_CONFIG}', v.body, websearch_to_tsquery('{FULLTEXT_CONFIG}', %s), %s)
+              FROM unnest(%s::int[], %s::text[]) AS v(id, body)
+        """, [query, FULLTEXT_HEADLINE_OPTIONS, list(texts), list(texts.values())])
+        return dict(self.env.cr.fetchall())
+
+    # Convierte transcript_object de Retell en turnos (hablante, texto, inicio y fin en segundos)
+    def _extract_transcript_turns(self, data_dict):
+        turns = []
+        for utterance in data_dict.get("transcript_object") or []:
+            if not isinstance(utterance, dict):
+                continue
+            words = utterance.get("words") or []
+            turns.append({
+                'speaker': utterance.get("role", ""),
+                'text': utterance.get("content", ""),
+                'start': words[0].get("start") if words else None,
+                'end': words[-1].get("end") if words else None,
+            })
+        return turns
+
+    # Mueve las transcripciones de la antigua columna de texto a retain.call.transcript
+    @api.model
+    def _migrate_legacy_transcriptions(self):
+        cr = self.env.cr
+        if not sql.column_exists(cr, self._table, 'transcription'):
+            return
+        Transcript = self.env['retain.call.transcript']
+        migradas = 0
+        while True:
+            cr.execute("""
+                SELECT id, transcription
+                  FROM retain_call_history
+                 WHERE transcription IS NOT NULL AND transcription != ''
+              ORDER BY id
+                 LIMIT %s
+            """, [BATCH_SIZE])
+            rows = cr.fetchall()
+            if not rows:
+                break
+            Transcript.create([
+                dict(Transcript._prepare_storage_vals(text=text), call_history_id=call_id)
+                for call_id, text in rows
+            ])
+            cr.execute("""
+                UPDATE retain_call_history
+                   SET transcription = NULL, has_transcription = TRUE
+                 WHERE id IN %s
+            """, [tuple(call_id for call_id, _text in rows)])
+            migradas += len(rows)
+        cr.execute("ALTER TABLE retain_call_history DROP COLUMN transcription")
+        self.invalidate_model(['transcription', 'has_transcription'])
+        _logger.info(f"Transcripciones migradas al almacenamiento comprimido: {migradas}")
 
     def _clean_text_formatting(self, text):
         """Limpia y normaliza el formato del texto para transcripciones y descripción"""
@@ -55,50 +398,102 @@ class RetainCallHistory(models.Model):
         # Sólo log en modo debug para evitar spam en logs
         if _logger.isEnabledFor(logging.DEBUG):
             _logger.debug(f"Limpiando texto (primeros 200 chars): {text[:200]}")
-        text = text.replace('\\n', '\n')
-        text = text.replace('\\r\\n', '\n')
-        text = text.replace('\\r', '\n')
-        text = text.replace('\\t', '    ')
-        text = text.replace('\\"', '"')
-        text = text.replace('\\/', '/')
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        text = '\n'.join([line.rstrip() for line in text.split('\n')])
+        # Cada paso sólo recorre/copia el texto si hay algo que cambiar; un texto ya
+        # normalizado (p. ej. el de una llamada que no ha cambiado) sale sin copias
+        if '\\' in text:
+            for escape, replacement in CLEAN_TEXT_ESCAPES:
+                if escape in text:
+                    text = text.replace(escape, replacement)
+        if '\n\n\n' in text:
+            text = CLEAN_TEXT_BLANK_LINES_RE.sub('\n\n', text)
+        if CLEAN_TEXT_TRAILING_SPACE_RE.search(text):
+            text = '\n'.join([line.rstrip() for line in text.split('\n')])
         return text.strip()
 
-    def _get_retell_headers(self):
-        api_key = "key_0f5e8f16b929dac96d750fb43293"
-        return {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
+    # La API key sólo se lee de ir.config_parameter; sin ella no se llama a Retell
+    def _get_retell_api_key(self):
+        api_key = self.env['ir.config_parameter'].sudo().get_param(RETELL_API_KEY_PARAM)
+        if not api_key:
+            raise UserError(
+                f"Falta la API key de Retell. Defínela en el parámetro del sistema {RETELL_API_KEY_PARAM}."
+            )
+        return api_key
 
-    # Busca el nombre del agente en los datos
+    # Cliente HTTP compartido por todas las etapas de una sincronización
+    def _get_retell_client(self):
+        params = self.env['ir.config_parameter'].sudo()
+        return RetellClient(
+            self._get_retell_api_key(),
+            base_url=params.get_param(RETELL_BASE_URL_PARAM),
+            connect_timeout=float(params.get_param(RETELL_CONNECT_TIMEOUT_PARAM, 5)),
+            read_timeout=float(params.get_param(RETELL_READ_TIMEOUT_PARAM, 30)),
+            max_retries=int(params.get_param(RETELL_MAX_RETRIES_PARAM, 3)),
+            concurrency=int(params.get_param(DETAIL_CONCURRENCY_PARAM, 8)),
+            rate_limit=float(params.get_param(DETAIL_RATE_LIMIT_PARAM, 10)),
+            circuit_threshold=int(params.get_param(RETELL_CIRCUIT_THRESHOLD_PARAM, 5)),
+            circuit_cooldown=float(params.get_param(RETELL_CIRCUIT_COOLDOWN_PARAM, 60)),
+        )
+
+    # Busca el nombre del agente en los datos: nivel principal, call_analysis y después
+    # el resto de objetos anidados, en un solo recorrido por el orden de AGENT_NAME_KEYS
     def _search_agent_name_in_data(self, data_dict, analysis_dict=None):
-        agent_fields = [
-            'agent_name', 'agent', 'assistant_name', 'assistant',
-            'agent_id', 'assistant_id', 'bot_name', 'bot_id',
-            'voice_agent', 'ai_agent', 'virtual_agent'
-        ]
-
-        # Buscar en el nivel principal
-        for field in agent_fields:
-            if data_dict.get(field):
-                return data_dict.get(field)
-
-        # Buscar en call_analysis si existe
+        candidates = [data_dict]
         if analysis_dict:
-            for field in agent_fields:
-                if analysis_dict.get(field):
-                    return analysis_dict.get(field)
-
-        # Buscar en objetos anidados
-        for key, value in data_dict.items():
-            if isinstance(value, dict):
-                for field in agent_fields:
-                    if value.get(field):
-                        return value.get(field)
+            candidates.append(analysis_dict)
+        candidates.extend(
+            value for value in data_dict.values()
+            if isinstance(value, dict) and value is not analysis_dict
+        )
+        for candidate in candidates:
+            for key in AGENT_NAME_KEYS:
+                value = candidate.get(key)
+                if value:
+                    return value
         return ""
 
+    # Mapeo compilado (campo, ruta) de CALL_FIELD_MAP_DEFAULT más lo configurado en
+    # CALL_FIELD_MAP_PARAM. Se construye una vez por proceso: set_param vacía la caché.
+    @tools.ormcache()
+    def _get_call_field_map(self):
+        field_map = dict(CALL_FIELD_MAP_DEFAULT)
+        configured = self.env['ir.config_parameter'].sudo().get_param(CALL_FIELD_MAP_PARAM)
+        if configured:
+            try:
+                configured = json.loads(configured)
+                if not isinstance(configured, dict):
+                    raise ValueError("se esperaba un objeto JSON")
+            except ValueError as e:
+                _logger.warning(f"Parámetro {CALL_FIELD_MAP_PARAM} no válido, se ignora: {e}")
+                configured = {}
+            for fname, path in configured.items():
+                field = self._fields.get(fname)
+                if not field or not field.store or field.compute or fname in CALL_FIELD_MAP_RESERVED \
+                        or not isinstance(path, str) or not path:
+                    _logger.warning(f"{CALL_FIELD_MAP_PARAM}: no se puede mapear '{fname}' desde '{path}'")
+                    continue
+                field_map[fname] = path
+        return tuple((fname, tuple(path.split('.'))) for fname, path in field_map.items())
+
+    # Valores del payload según el mapeo compilado; una ruta que no existe da ""
+    def _map_call_fields(self, llamada_data):
+        vals = {}
+        for fname, path in self._get_call_field_map():
+            value = llamada_data
+            for key in path:
+                value = value.get(key, "") if isinstance(value, dict) else ""
+            vals[fname] = value
+        return vals
+
+    # Prefijo de la huella: cambia con PAYLOAD_HASH_VERSION y con el mapeo configurado,
+    # para que las llamadas se vuelvan a procesar al cambiar cualquiera de los dos
+    @tools.ormcache()
+    def _get_payload_hash_prefix(self):
+        configured = self.env['ir.config_parameter'].sudo().get_param(CALL_FIELD_MAP_PARAM)
+        if not configured:
+            return f"{PAYLOAD_HASH_VERSION}:"
+        field_map = json.dumps(self._get_call_field_map(), separators=(',', ':'))
+        return f"{PAYLOAD_HASH_VERSION}:{field_map}:"
+
     # Busca la transcripción en el diccionario de datos
     def _search_transcription_in_data(self, data_dict, analysis_dict=None):
         transcription = (
@@ -126,46 +521,130 @@ class RetainCallHistory(models.Model):
     # Crea nuevos registros asignando secuencia y limpiando texto
     @api.model_create_multi
     def create(self, vals_list):
+        # Las llamadas restauradas de la papelera (o que ya traen número) lo conservan
+        sin_numero = [vals for vals in vals_list if vals.get('sequence') in (None, False, 'Nuevo')]
+        for vals, number in zip(sin_numero, self._reserve_sequence_numbers(len(sin_numero))):
+            vals['sequence'] = number
         for vals in vals_list:
-            vals['sequence'] = self.env['ir.sequence'].next_by_code('retain.call.sequence') or 'Nuevo'
-            for field in ['transcription', 'description_llamada']:
+            for field in CLEAN_TEXT_FIELDS:
                 if field in vals:
                     vals[field] = self._clean_text_formatting(vals[field])
-        return super().create(vals_list)
+        agent_ids = self.env['retain.call.agent']._get_or_create_ids(vals.get('agent_name') for vals in vals_list)
+        for vals in vals_list:
+            vals['agent_id'] = agent_ids.get(vals.get('agent_name'), False)
+        records = super().create(vals_list)
+        self._invalidate_agent_names_cache([vals.get('agent_name') for vals in vals_list])
+        return records
+
+    # Reserva `count` números de retain.call.sequence con una sola consulta a la secuencia
+    # de PostgreSQL (implementación 'standard'); con otras implementaciones pide uno a uno
+    @api.model
+    def _reserve_sequence_numbers(self, count):
+        if not count:
+            return []
+        Sequence = self.env['ir.sequence']
+        seq = Sequence.search([
+            ('code', '=', 'retain.call.sequence'),
+            ('company_id', 'in', [self.env.company.id, False]),
+        ], order='company_id', limit=1)
+        if not seq:
+            return ['Nuevo'] * count
+        if seq.implementation != 'standard' or seq.use_date_range:
+            return [Sequence.next_by_code('retain.call.sequence') or 'Nuevo' for _i in range(count)]
+        self.env.cr.execute(
+            "SELECT nextval(%s) FROM generate_series(1, %s)", ['ir_sequence_%03d' % seq.id, count]
+        )
+        return [seq.sudo().get_next_char(row[0]) for row in self.env.cr.fetchall()]
 
     # Actualiza registros limpiando el formato del texto
     def write(self, vals):
-        for field in ['transcription', 'description_llamada']:
+        for field in CLEAN_TEXT_FIELDS:
             if field in vals:
                 vals[field] = self._clean_text_formatting(vals[field])
-        return super().write(vals)
+        if 'agent_name' in vals:
+            agent_ids = self.env['retain.call.agent']._get_or_create_ids([vals['agent_name']])
+            vals['agent_id'] = agent_ids.get(vals['agent_name'], False)
+        res = super().write(vals)
+        if 'agent_name' in vals:
+            self._invalidate_agent_names_cache([vals['agent_name']])
+        return res
+
+    # Lista de agentes distintos para la barra de filtros de la vista lista
+    @api.model
+    def get_distinct_agent_names(self):
+        return list(self._get_distinct_agent_names())
+
+    # Se recorren los agentes (pocas filas) y se comprueba con el índice de agent_id
+    # que tengan alguna llamada, en lugar de agrupar toda la tabla de llamadas
+    @tools.ormcache()
+    def _get_distinct_agent_names(self):
+        self.flush_model(['agent_id'])
+        self.env.cr.execute("""
+            SELECT a.name
+              FROM retain_call_agent a
+             WHERE EXISTS (SELECT 1 FROM retain_call_history h WHERE h.agent_id = a.id)
+          ORDER BY a.name
+        """)
+        return tuple(row[0] for row in self.env.cr.fetchall())
+
+    # Vacía la caché de agentes sólo si aparece un nombre que no estaba en ella
+    def _invalidate_agent_names_cache(self, agent_names):
+        if set(filter(None, agent_names)) - set(self._get_distinct_agent_names()):
+            self.env.registry.clear_cache()
+
+    # Vacía la caché de agentes sólo si alguno de `agent_ids` que estaba en ella se ha
+    # quedado sin llamadas
+    def _invalidate_removed_agents_cache(self, agent_ids):
+        if not agent_ids:
+            return
+        self.flush_model(['agent_id'])
+        self.env.cr.execute("""
+            SELECT a.name
+              FROM retain_call_agent a
+             WHERE a.id IN %s
+               AND NOT EXISTS (SELECT 1 FROM retain_call_history h WHERE h.agent_id = a.id)
+        """, [agent_ids])
+        removed = {row[0] for row in self.env.cr.fetchall()}
+        if removed & set(self._get_distinct_agent_names()):
+            self.env.registry.clear_cache()
+
+    # Campos que se copian entre el historial y la papelera, derivados de ambos modelos
+    @tools.ormcache()
+    def _get_trash_field_names(self):
+        trash_fields = self.env['retain.call.history.trash']._fields
+        return tuple(
+            name for name, field in self._fields.items()
+            if name in trash_fields and name not in models.MAGIC_COLUMNS
+            and (field.store or field.inverse) and not trash_fields[name].compute
+        )
 
     # Elimina registros moviéndolos a la papelera (tabla retain.call.history.trash)
+    # Las llamadas borradas pasan a la papelera
     def unlink(self):
-        for record in self:
-            self.env['retain.call.history.trash'].create({
-                'sequence': record.sequence,
-                'name': record.name,
-                'phone': record.phone,
-                'call_status': record.call_status,
-                'status_var': record.status_var,
-                'description_llamada': record.description_llamada,
-                'duration': record.duration,
-                'duration_ms': record.duration_ms,
-                'direction': record.direction,
-                'from_number': record.from_number,
-                'to_number': record.to_number,
-                'agent_name': record.agent_name,
-                'disconnection_reason': record.disconnection_reason,
-                'call_id': record.call_id,
-                'transcription': record.transcription
-            })
-        return super().unlink()
+        field_names = self._get_trash_field_names()
+        Trash = self.env['retain.call.history.trash']
+        for start in range(0, len(self), BATCH_SIZE):
+            Trash.create(read_for_copy(self[start:start + BATCH_SIZE], field_names))
+        return self._unlink_and_refresh()
 
-    # Descarga una llamada como archivo de texto (contenido en español)
-    def action_descargar_llamada(self):
+    # Borrado de las llamadas que pasan al archivo (retain.call.archive): no van a la papelera
+    def _unlink_for_archive(self):
+        return self._unlink_and_refresh()
+
+    # Borra las llamadas y actualiza la caché de agentes y el resumen diario
+    def _unlink_and_refresh(self):
+        agent_ids = tuple(self.mapped('agent_id').ids)
+        days = {call_date.date() for call_date in self.mapped('call_date') if call_date}
+        res = super().unlink()
+        self._invalidate_removed_agents_cache(agent_ids)
+        # Las llamadas borradas no dejan write_date: sus días se recalculan aquí
+        self.env['retain.call.daily.stats']._refresh_days(days)
+        return res
+
+    # Contenido de la descarga de una llamada (en español)
+    def _get_download_text(self):
         self.ensure_one()
-        contenido = (
+        return (
             f"Número de Llamada: {self.sequence}\n"
             f"Nombre: {self.name}\n"
             f"Teléfono: {self.phone}\n"
@@ -175,38 +654,91 @@ class RetainCallHistory(models.Model):
             f"Descripción de la llamada: {self.description_llamada or ''}\n"
             f"Transcripción: {self.transcription or ''}"
         )
-        base64_file = base64.b64encode(contenido.encode('utf-8'))
+
+    # Descarga una llamada como archivo de texto; para muchas llamadas usar retain.call.export
+    def action_descargar_llamada(self):
+        self.ensure_one()
         return {
             'type': 'ir.actions.act_url',
-            'url': (
-                f"/web/content/?model=retain.call.history"
-                f"&id={self.id}&field=description_llamada&download=true"
-                f"&filename=llamada_{self.sequence}.txt"
-            ),
+            'url': f"/retain_call_history/call/{self.id}/download",
             'target': 'self',
         }
 
-    # Obtiene todas las llamadas de la API de Retell y las trae a Odoo
-    def _fetch_all_calls_from_retell(self):
-        url = "https://api.retellai.com/v2/list-calls"
-        headers = self._get_retell_headers()
-        total_llamadas = []
-        cursor = None
+    # Devuelve el umbral inferior (ms) para la sincronización incremental
+    def _get_sync_lower_threshold(self):
+        last_ts = int(self.env['retain.call.sync.state']._get_state().last_start_timestamp)
+        if not last_ts:
+            return None
+        overlap = int(self.env['ir.config_parameter'].sudo().get_param(SYNC_OVERLAP_PARAM, SYNC_OVERLAP_DEFAULT) or 0)
+        # Ventana de solapamiento para recoger cambios de estado tardíos
+        return max(last_ts - overlap * 60 * 1000, 0)
+
+    # Guarda la marca de agua (start_timestamp más reciente sincronizado)
+    def _set_sync_last_timestamp(self, start_ts):
+        if not start_ts:
+            return
+        state = self.env['retain.call.sync.state']._get_state()
+        if start_ts > state.last_start_timestamp:
+            state.last_start_timestamp = start_ts
+
+    # Lee el punto de reanudación guardado por una sincronización interrumpida
+    def _get_sync_checkpoint(self, full=False):
+        checkpoint = self.env['retain.call.sync.state']._get_state().checkpoint
+        if not isinstance(checkpoint, dict):
+            return None
+        return checkpoint if checkpoint.get('full') == full else None
+
+    # Guarda (o borra si es None) el punto de reanudación de la sincronización
+    def _set_sync_checkpoint(self, checkpoint):
+        self.env['retain.call.sync.state']._get_state().checkpoint = checkpoint or False
+
+    # Genera las páginas de llamadas de Retell una a una (sólo las nuevas salvo full=True).
+    # Cada página va acompañada del punto de reanudación para pedir la siguiente.
+    def _iter_retell_call_pages(self, client, full=False):
+        checkpoint = self._get_sync_checkpoint(full=full)
+        if checkpoint:
+            lower_threshold = checkpoint.get('lower_threshold')
+            cursor = checkpoint.get('cursor')
+            cursor_key = checkpoint.get('cursor_key') or "cursor"
+            _logger.info(f"Reanudando sincronización desde el cursor {cursor}")
+        else:
+            lower_threshold = None if full else self._get_sync_lower_threshold()
+            cursor = None
+            cursor_key = "cursor"
+        base_payload = {"sort_order": "ascending", "limit": RETELL_PAGE_SIZE}
+        if lower_threshold:
+            base_payload["filter_criteria"] = {
+                "start_timestamp": {"lower_threshold": lower_threshold},
+            }
+        _logger.info(f"Consultando Retell desde start_timestamp={lower_threshold or 'inicio'}")
         while True:
-            payload = {"cursor": cursor} if cursor else {}
+            payload = dict(base_payload)
+            if cursor:
+                payload[cursor_key] = cursor
             try:
-                response = requests.post(url, headers=headers, json=payload)
+                response = client.post("/v2/list-calls", json=payload)
                 response.raise_for_status()
             except requests.exceptions.RequestException as e:
                 _logger.error(f"Error en la petición: {e}")
                 raise UserError(f"Error al consultar Retell:\n{str(e)}")
             data = response.json()
-            llamadas = data.get("calls", []) if isinstance(data, dict) else data
-            total_llamadas.extend(llamadas)
-            cursor = data.get("next_cursor") if isinstance(data, dict) else None
+            if isinstance(data, dict):
+                llamadas = data.get("calls", [])
+                cursor = data.get("next_cursor")
+            else:
+                # La API v2 devuelve una lista y pagina con pagination_key (último call_id)
+                llamadas = data
+                cursor_key = "pagination_key"
+                cursor = llamadas[-1].get("call_id") if len(llamadas) >= RETELL_PAGE_SIZE else None
+            next_checkpoint = cursor and {
+                'full': full,
+                'lower_threshold': lower_threshold,
+                'cursor': cursor,
+                'cursor_key': cursor_key,
+            }
+            yield llamadas, next_checkpoint
             if not cursor:
                 break
-        return total_llamadas
 
     # Procesa los datos de una llamada individual de Retell
     def _process_call_data(self, llamada_data):
@@ -215,7 +747,7 @@ class RetainCallHistory(models.Model):
             return None
         phone = llamada_data.get("to_number") or llamada_data.get("from_number") or ""
         status_raw = llamada_data.get("call_status", "unknown")
-        status = status_raw if status_raw in dict(self._fields['call_status'].selection) else 'unknown'
+        status = status_raw if status_raw in CALL_STATUS_VALUES else 'unknown'
         start_ts = llamada_data.get("start_timestamp")
         duration_ms = llamada_data.get("duration_ms", 0)
         call_date = datetime.utcfromtimestamp(start_ts / 1000.0) if start_ts else False
@@ -230,8 +762,11 @@ class RetainCallHistory(models.Model):
                 transcription = json.dumps(transcription, indent=2, ensure_ascii=False)
         # Buscar nombre del agente
         agent_name = self._search_agent_name_in_data(llamada_data, analysis)
+        disconnection_reason = llamada_data.get("disconnection_reason", "")
+        turns = self._extract_transcript_turns(llamada_data)
 
-        return {
+        vals = self._map_call_fields(llamada_data)
+        vals.update({
             'call_id': call_id,
             'name': 'Sin nombre',
             'phone': phone,
@@ -239,76 +774,246 @@ class RetainCallHistory(models.Model):
             'call_date': call_date,
             'duration': duration_min,
             'duration_ms': duration_ms,
-            'direction': llamada_data.get("direction", ""),
-            'from_number': llamada_data.get("from_number", ""),
-            'to_number': llamada_data.get("to_number", ""),
             'agent_name': agent_name,
-            'disconnection_reason': llamada_data.get("disconnection_reason", ""),
-            'description_llamada': analysis.get("call_summary", ""),
+            'disconnection_reason': DISCONNECTION_REASON_MAP.get(disconnection_reason, disconnection_reason),
             'transcription': transcription,
+        })
+        if turns:
+            vals['transcript_turns'] = turns
+        return vals
+
+    # Devuelve sólo los valores que difieren de lo guardado en el registro
+    def _get_changed_vals(self, record, vals):
+        changed = {}
+        for fname, value in vals.items():
+            field = self._fields[fname]
+            if fname in ENRICHED_FIELDS and not value and record[fname]:
+                continue
+            if fname in CLEAN_TEXT_FIELDS:
+                # Se compara contra el texto tal como quedaría guardado
+                new_value = self._clean_text_formatting(value)
+            else:
+                new_value = field.convert_to_record(field.convert_to_cache(value, record, validate=False), record)
+            if (new_value or False) != (record[fname] or False):
+                changed[fname] = value
+        return changed
+
+    # Inserta o actualiza un lote de llamadas con una sola búsqueda por lote
+    def _upsert_calls(self, vals_list):
+        # Deduplicar por call_id dentro del lote (gana el último)
+        vals_by_call_id = {vals['call_id']: vals for vals in vals_list}
+        existing_by_call_id = {
+            record.call_id: record
+            for record in self.search([('call_id', 'in', list(vals_by_call_id))])
         }
+        to_create = []
+        to_write = {}
+        for call_id, vals in vals_by_call_id.items():
+            record = existing_by_call_id.get(call_id)
+            if not record:
+                to_create.append(vals)
+                continue
+            changed = self._get_changed_vals(record, vals)
+            if changed:
+                # Agrupa registros con los mismos cambios para escribirlos juntos. La clave es
+                # el JSON de los cambios: transcript_turns es una lista y no se puede usar tal cual
+                key = json.dumps(changed, sort_keys=True, default=str)
+                changed, records = to_write.get(key, (changed, self.browse()))
+                to_write[key] = (changed, records | record)
+        if to_create:
+            self.create(to_create)
+        for changed, records in to_write.values():
+            records.write(changed)
+        return len(to_create), sum(len(records) for _changed, records in to_write.values())
+
+    # Huella SHA-256 del payload de Retell normalizado (claves ordenadas)
+    def _compute_payload_hash(self, llamada_data):
+        payload = json.dumps(llamada_data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+        return hashlib.sha256(f"{self._get_payload_hash_prefix()}{payload}".encode('utf-8')).hexdigest()
 
-    # Sincroniza los datos básicos de las llamadas
-    def _sync_basic_call_data(self, total_llamadas):
-        nuevas, actualizadas = 0, 0
+    # Huellas guardadas de las llamadas indicadas, leídas sin pasar por el ORM
+    def _get_stored_payload_hashes(self, call_ids):
+        if not call_ids:
+            return {}
+        self.flush_model(['call_id', 'payload_hash'])
+        self.env.cr.execute(
+            "SELECT call_id, payload_hash FROM retain_call_history WHERE call_id IN %s",
+            [tuple(call_ids)],
+        )
+        return dict(self.env.cr.fetchall())
+
+    # Sincroniza los datos básicos de las llamadas. Las que llegan con la misma huella
+    # que la guardada se omiten sin procesarlas ni escribirlas.
+    # Si recibe `metrics` (ver _new_sync_metrics) acumula en él las etapas 'process' y 'upsert'.
+    def _sync_basic_call_data(self, total_llamadas, metrics=None):
+        nuevas, cambiadas, omitidas = 0, 0, 0
         transcripciones_encontradas = 0
 
-        for i, llamada_data in enumerate(total_llamadas):
-            # Log para debug - solo para las primeras 5 llamadas
-            if i < 5:
-                _logger.info(f"Call ID: {llamada_data.get('call_id')}")
-                _logger.info(f"Available keys: {list(llamada_data.keys())}")
-                analysis = llamada_data.get("call_analysis", {})
-                if analysis:
-                    _logger.info(f"Call analysis keys: {list(analysis.keys())}")
-            vals = self._process_call_data(llamada_data)
-            if not vals:
-                continue
-            if vals.get('transcription'):
-                transcripciones_encontradas += 1
-            existing = self.env['retain.call.history'].search([('call_id', '=', vals['call_id'])], limit=1)
-            if existing:
-                existing.write(vals)
-                actualizadas += 1
-            else:
-                self.create(vals)
-                nuevas += 1
-        return nuevas, actualizadas, transcripciones_encontradas
+        for start in range(0, len(total_llamadas), SYNC_BATCH_SIZE):
+            mark = self._stage_mark()
+            lote = {}
+            for i, llamada_data in enumerate(total_llamadas[start:start + SYNC_BATCH_SIZE], start):
+                # Log para debug - solo para las primeras 5 llamadas
+                if i < 5:
+                    _logger.info(f"Call ID: {llamada_data.get('call_id')}")
+                    _logger.info(f"Available keys: {list(llamada_data.keys())}")
+                    analysis = llamada_data.get("call_analysis", {})
+                    if analysis:
+                        _logger.info(f"Call analysis keys: {list(analysis.keys())}")
+                if llamada_data.get("call_id"):
+                    # Deduplicar por call_id dentro del lote (gana el último)
+                    lote[llamada_data["call_id"]] = llamada_data
+            # Las llamadas archivadas no se vuelven a crear en el historial
+            for call_id in self.env['retain.call.archive']._get_archived_call_ids(list(lote)):
+                del lote[call_id]
+            stored_hashes = self._get_stored_payload_hashes(list(lote))
+            vals_list = []
+            for call_id, llamada_data in lote.items():
+                payload_hash = self._compute_payload_hash(llamada_data)
+                if call_id in stored_hashes and stored_hashes[call_id] == payload_hash:
+                    omitidas += 1
+                    continue
+                vals = self._process_call_data(llamada_data)
+                if not vals:
+                    continue
+                vals['payload_hash'] = payload_hash
+                if vals.get('transcription'):
+                    transcripciones_encontradas += 1
+                vals_list.append(vals)
+            mark = self._stage_add(metrics, 'process', mark)
+            creadas, _modificadas = self._upsert_calls(vals_list)
+            self._stage_add(metrics, 'upsert', mark)
+            nuevas += creadas
+            cambiadas += len(vals_list) - creadas
+        return nuevas, cambiadas, omitidas, transcripciones_encontradas
+
+    # Métricas por etapa de una sincronización: segundos y consultas SQL. La traducción de
+    # motivos se hace dentro del mapeo (_process_call_data), así que cuenta como 'process'.
+    def _new_sync_metrics(self):
+        return {
+            'time': dict.fromkeys(SYNC_STAGES, 0.0),
+            'queries': dict.fromkeys(SYNC_STAGES, 0),
+        }
 
+    def _stage_mark(self):
+        return time.perf_counter(), self.env.cr.sql_log_count
+
+    # Suma a la etapa lo transcurrido desde `mark` y devuelve la nueva marca
+    def _stage_add(self, metrics, stage, mark):
+        now = self._stage_mark()
+        if metrics is not None:
+            metrics['time'][stage] += now[0] - mark[0]
+            metrics['queries'][stage] += now[1] - mark[1]
+        return now
+
+    # Encola la sincronización y devuelve el control al usuario de inmediato
     def action_sincronizar_historial(self):
+        return self.env['retain.call.sync.job'].action_enqueue(full=False)
+
+    # Vuelve a descargar todo el historial de Retell ignorando la marca de agua
+    def action_sincronizar_historial_completo(self):
+        return self.env['retain.call.sync.job'].action_enqueue(full=True)
+
+    # Ejecuta la sincronización completa. Si recibe un job (retain.call.sync.job) va
+    # guardando en él el progreso junto con cada commit parcial.
+    def _sincronizar_historial(self, full=False, job=None):
+        # Pico de memoria de esta ejecución para peak_memory_mb (ver _metrics_vals)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
         try:
-            _logger.info("Iniciando sincronización de llamadas desde Retell...")
-            total_llamadas = self._fetch_all_calls_from_retell()
-            _logger.info(f"Obtenidas {len(total_llamadas)} llamadas de Retell")
-            nuevas, actualizadas, transcripciones_encontradas = self._sync_basic_call_data(total_llamadas)
-            _logger.info(f"Sincronización básica: {nuevas} nuevas, {actualizadas} actualizadas, {transcripciones_encontradas} con transcripción")
-            transcripciones_adicionales, agentes_adicionales = self._complete_missing_data()
-            agentes_adicionales += self._exhaustive_agent_search()
-            self.action_traducir_motivos_existentes()
-            return self._show_sync_results(nuevas, actualizadas, transcripciones_adicionales, agentes_adicionales)
+            _logger.info(f"Iniciando sincronización {'completa' if full else 'incremental'} de llamadas desde Retell...")
+            total, nuevas, actualizadas, omitidas, transcripciones_encontradas = 0, 0, 0, 0, 0
+            metrics = self._new_sync_metrics()
+            # Cada página se procesa y confirma por separado: la memoria no crece con
+            # el tamaño de la cuenta y un fallo se reanuda desde la última página guardada
+            client = self._get_retell_client()
+            pages = self._iter_retell_call_pages(client, full=full)
+            while True:
+                mark = self._stage_mark()
+                page = next(pages, None)
+                self._stage_add(metrics, 'fetch', mark)
+                if page is None:
+                    break
+                llamadas, checkpoint = page
+                creadas, modificadas, sin_cambios, con_transcripcion = self._sync_basic_call_data(llamadas, metrics)
+                total += len(llamadas)
+                nuevas += creadas
+                actualizadas += modificadas
+                omitidas += sin_cambios
+                transcripciones_encontradas += con_transcripcion
+                self._set_sync_last_timestamp(max(
+                    (llamada.get("start_timestamp") or 0 for llamada in llamadas), default=0
+                ))
+                self._set_sync_checkpoint(checkpoint)
+                if job:
+                    job.write(dict(job._metrics_vals(metrics, client.get_stats()), **{
+                        'pages_fetched': job.pages_fetched + 1,
+                        'calls_fetched': total,
+                        'calls_created': nuevas,
+                        'calls_updated': actualizadas,
+                        'calls_skipped': omitidas,
+                    }))
+                self.env.cr.commit()
+                self.env.invalidate_all()
+            _logger.info(f"Obtenidas {total} llamadas de Retell")
+            _logger.info(f"Sincronización básica: {nuevas} nuevas, {actualizadas} con cambios, {omitidas} sin cambios, "
+                         f"{transcripciones_encontradas} con transcripción")
+            mark = self._stage_mark()
+            with client:
+                transcripciones_adicionales, agentes_adicionales = self._enrich_missing_details(client, job=job)
+            self._stage_add(metrics, 'enrich', mark)
+            self.env['retain.call.daily.stats']._refresh_changed()
+            self.env.cr.commit()
+            _logger.info("Etapas de la sincronización: " + ", ".join(
+                f"{stage} {metrics['time'][stage]:.2f}s/{metrics['queries'][stage]} consultas" for stage in SYNC_STAGES
+            ))
+            if job:
+                job.write(job._metrics_vals(metrics, client.get_stats()))
+            return self._show_sync_results(
+                nuevas, actualizadas, transcripciones_adicionales, agentes_adicionales, client.get_stats(), job=job
+            )
         except Exception as e:
             _logger.error(f"Error en sincronización: {e}")
             raise UserError(f"Error durante la sincronización: {str(e)}")
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
 
-    def _complete_missing_data(self):
-        headers = self._get_retell_headers()
+    # Completa transcripción y agente consultando /v2/get-call una sola vez por llamada.
+    # Las llamadas ya consultadas no se repiten hasta pasados enrichment_retry_days días.
+    def _enrich_missing_details(self, client, job=None):
+        retry_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            ENRICHMENT_RETRY_DAYS_PARAM, ENRICHMENT_RETRY_DAYS_DEFAULT
+        ))
+        retry_deadline = fields.Datetime.now() - timedelta(days=retry_days)
         llamadas_incompletas = self.env['retain.call.history'].search([
+            ('call_id', '!=', False),
             '|', '|',
-            ('transcription', '=', False),
-            ('transcription', '=', ''),
-            ('agent_name', '=', '')
+            ('has_transcription', '=', False),
+            ('agent_name', '=', False),
+            ('agent_name', '=', ''),
+            '|',
+            ('enrichment_attempted_at', '=', False),
+            ('enrichment_attempted_at', '<', retry_deadline),
         ])
+        _logger.info(f"Enriquecimiento: {len(llamadas_incompletas)} llamadas con datos incompletos")
         transcripciones_adicionales = 0
         agentes_adicionales = 0
+        errores = 0
 
-        for llamada in llamadas_incompletas:
-            if not llamada.call_id:
-                continue
-            try:
-                transcript_url = f"https://api.retellai.com/v2/get-call/{llamada.call_id}"
-                transcript_response = requests.get(transcript_url, headers=headers)
-                if transcript_response.status_code == 200:
-                    call_detail = transcript_response.json()
+        for start in range(0, len(llamadas_incompletas), DETAIL_BATCH_SIZE):
+            lote = llamadas_incompletas[start:start + DETAIL_BATCH_SIZE]
+            detalles = client.fetch_call_details(lote.mapped('call_id'))
+            now = fields.Datetime.now()
+            consultadas = self.browse()
+            for llamada in lote:
+                call_detail = detalles.get(llamada.call_id)
+                if not call_detail:
+                    errores += 1
+                    continue
+                try:
                     analysis_detail = call_detail.get("call_analysis", {})
                     # Buscar transcripción
                     transcription = self._search_transcription_in_data(call_detail, analysis_detail)
@@ -316,136 +1021,99 @@ class RetainCallHistory(models.Model):
                     agent_name = self._search_agent_name_in_data(call_detail, analysis_detail)
                     # Preparar datos para actualizar
                     update_vals = {}
-                    if transcription and (not llamada.transcription or llamada.transcription == ''):
+                    if transcription and not llamada.has_transcription:
+                        turns = self._extract_transcript_turns(call_detail)
+                        if turns:
+                            update_vals['transcript_turns'] = turns
                         if isinstance(transcription, list):
                             transcription = '\n'.join(map(str, transcription))
                         elif isinstance(transcription, dict):
                             transcription = json.dumps(transcription, indent=2, ensure_ascii=False)
                         update_vals['transcription'] = transcription
                         transcripciones_adicionales += 1
-                    if agent_name and (not llamada.agent_name or llamada.agent_name == ''):
+                    if agent_name and not llamada.agent_name:
                         update_vals['agent_name'] = agent_name
                         agentes_adicionales += 1
-                    # Actualizar si hay cambios
+                    elif not agent_name and not llamada.agent_name:
+                        _logger.info(f"No se encontró agente para {llamada.call_id}. Campos: {list(call_detail.keys())}")
                     if update_vals:
+                        update_vals['enrichment_attempted_at'] = now
                         llamada.write(update_vals)
-            except Exception as e:
-                _logger.error(f"Error obteniendo detalles para {llamada.call_id}: {e}")
-        return transcripciones_adicionales, agentes_adicionales
-
-    # Búsqueda exhaustiva de nombres de agentes para llamadas que aún no tienen nombre de agente
-    def _exhaustive_agent_search(self):
-        headers = self._get_retell_headers()
-        llamadas_sin_agente = self.env['retain.call.history'].search([
-            '|',
-            ('agent_name', '=', False),
-            ('agent_name', '=', '')
-        ])
-        _logger.info(f"Búsqueda exhaustiva: {len(llamadas_sin_agente)} llamadas sin agente")
-        agentes_adicionales = 0
-        for llamada in llamadas_sin_agente:
-            if not llamada.call_id:
-                continue
-            try:
-                detail_url = f"https://api.retellai.com/v2/get-call/{llamada.call_id}"
-                detail_response = requests.get(detail_url, headers=headers)
-                if detail_response.status_code == 200:
-                    call_detail = detail_response.json()
-                    analysis_detail = call_detail.get("call_analysis", {})
-                    agent_name = self._search_agent_name_in_data(call_detail, analysis_detail)
-                    if agent_name:
-                        llamada.write({'agent_name': agent_name})
-                        agentes_adicionales += 1
-                        _logger.info(f"Agente encontrado para {llamada.call_id}: {agent_name}")
                     else:
-                        _logger.info(f"No se encontró agente para {llamada.call_id}. Campos: {list(call_detail.keys())}")
-            except Exception as e:
-                _logger.error(f"Error obteniendo detalles para {llamada.call_id}: {e}")
-        return agentes_adicionales
+                        consultadas |= llamada
+                except Exception as e:
+                    errores += 1
+                    _logger.error(f"Error obteniendo detalles para {llamada.call_id}: {e}")
+            # Marca de una sola vez las llamadas consultadas sin datos nuevos
+            consultadas.write({'enrichment_attempted_at': now})
+            if job:
+                job.write({
+                    'details_fetched': job.details_fetched + len(lote),
+                    'transcriptions_added': transcripciones_adicionales,
+                    'agents_added': agentes_adicionales,
+                    'errors_count': errores,
+                })
+            self.env.cr.commit()
+            # Suelta de la caché lo escrito en el lote para que la memoria no crezca con la cuenta
+            self.env.invalidate_all()
+        return transcripciones_adicionales, agentes_adicionales
 
-    # Muestra los resultados de la sincronización
-    def _show_sync_results(self, nuevas, actualizadas, transcripciones_adicionales, agentes_adicionales):
+    # Registra los resultados de la sincronización y devuelve el resumen en texto
+    def _show_sync_results(self, nuevas, actualizadas, transcripciones_adicionales, agentes_adicionales, api_stats=None, job=None):
         llamadas_con_transcripcion = self.env['retain.call.history'].search_count([
-            ('transcription', '!=', False), ('transcription', '!=', '')
+            ('has_transcription', '=', True)
         ])
         llamadas_con_agente = self.env['retain.call.history'].search_count([
             ('agent_name', '!=', False), ('agent_name', '!=', '')
         ])
         total_llamadas_count = self.env['retain.call.history'].search_count([])
-        mensaje = f"Sincronización completada."
+        if job:
+            job.write({
+                'total_calls': total_llamadas_count,
+                'calls_with_transcription': llamadas_con_transcripcion,
+                'calls_with_agent': llamadas_con_agente,
+            })
         _logger.info(f"Resultados finales - Total: {total_llamadas_count}, Nuevas: {nuevas}, "
                     f"Actualizadas: {actualizadas}, Con agente: {llamadas_con_agente}, "
                     f"Agentes adicionales: {agentes_adicionales}")
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': mensaje,
-                'type': 'success',
-                'sticky': False,
-            }
-        }
+        resumen = (f"Total: {total_llamadas_count} llamadas, {llamadas_con_transcripcion} con transcripción, "
+                   f"{llamadas_con_agente} con agente.")
+        if api_stats:
+            resumen_api = (f"Peticiones a Retell: {api_stats['requests']} ({api_stats['errors']} errores, "
+                           f"{api_stats['retries']} reintentos), latencia p50 {api_stats['latency_p50_ms']} ms, "
+                           f"p95 {api_stats['latency_p95_ms']} ms, máx {api_stats['latency_max_ms']} ms")
+            _logger.info(resumen_api)
+            resumen = f"{resumen}\n{resumen_api}"
+        return resumen
 
     # Método para ejecutar sincronización automática vía cron
     @api.model
     def cron_sincronizar_historial(self):
-        try:
-            self.action_sincronizar_historial()
-            _logger.info("Sincronización automática completada")
-        except Exception as e:
-            _logger.error(f"Error en sincronización automática: {e}")
+        self.env['retain.call.sync.job']._enqueue(full=False)
 
+    # Traduce en bloque (una sola sentencia SQL) los motivos guardados antes de
+    # traducirse al importar. Se ejecuta al actualizar el módulo, no en cada sincronización.
     def action_traducir_motivos_existentes(self):
-        motivo_map = {
-            'user_hangup': 'El usuario colgó',
-            'agent_hangup': 'El agente colgó',
-            'call_transfer': 'Llamada transferida a otro destino',
-            'voicemail_reached': 'Se llegó al buzón de voz',
-            'inactivity': 'Llamada finalizada por inactividad',
-            'max_duration_reached': 'Tiempo máximo de llamada alcanzado',
-            'concurrency_limit_reached': 'Límite de llamadas simultáneas alcanzado',
-            'no_valid_payment': 'Llamada cancelada por falta de pago válido',
-            'scam_detected': 'Llamada finalizada por detección de posible estafa',
-            'dial_busy': 'El número estaba ocupado',
-            'dial_failed': 'Error al intentar marcar el número',
-            'dial_no_answer': 'El número no respondió',
-            'invalid_destination': 'Destino inválido',
-            'telephony_provider_permission_denied': 'Permiso denegado por el proveedor de telefonía',
-            'telephony_provider_unavailable': 'Proveedor de telefonía no disponible',
-            'sip_routing_error': 'Error de enrutamiento SIP',
-            'marked_as_spam': 'Llamada marcada como spam',
-            'user_declined': 'El usuario rechazó la llamada',
-            'error_llm_websocket_open': 'Error al abrir la conexión WebSocket del modelo IA',
-            'error_llm_websocket_lost_connection': 'Conexión WebSocket con el modelo IA perdida',
-            'error_llm_websocket_runtime': 'Error de ejecución en WebSocket del modelo IA',
-            'error_llm_websocket_corrupt_payload': 'Paquete de datos corrupto en WebSocket del modelo IA',
-            'error_no_audio_received': 'No se recibió audio durante la llamada',
-            'error_asr': 'Error en el reconocimiento de voz (ASR)',
-            'error_retell': 'Error interno del sistema Retell',
-            'error_unknown': 'Error desconocido',
-            'error_user_not_joined': 'El usuario no se unió a la llamada',
-            'registered_call_timeout': 'Tiempo de espera agotado al registrar la llamada',
-            'timeout': 'Tiempo agotado',
-            'network_error': 'Error de red',
-            'busy': 'Ocupado',
-            'no_answer': 'Sin respuesta',
-            'rejected': 'Rechazada',
-            'completed': 'Completada',
-            'unknown': 'Desconocido',
-        }
-        llamadas = self.env['retain.call.history'].search([])
-        for llamada in llamadas:
-            motivo_raw = llamada.disconnection_reason
-            motivo_es = motivo_map.get(motivo_raw, motivo_raw)
-            if motivo_raw != motivo_es:
-                llamada.disconnection_reason = motivo_es
+        codigos = list(DISCONNECTION_REASON_MAP)
+        Llamada = self.env['retain.call.history']
+        Llamada.flush_model(['disconnection_reason'])
+        self.env.cr.execute("""
+            UPDATE retain_call_history h
+               SET disconnection_reason = m.motivo
+              FROM (SELECT unnest(%s::varchar[]) AS codigo,
+                           unnest(%s::varchar[]) AS motivo) m
+             WHERE h.disconnection_reason = m.codigo
+        """, [codigos, [DISCONNECTION_REASON_MAP[codigo] for codigo in codigos]])
+        traducidas = self.env.cr.rowcount
+        Llamada.invalidate_model(['disconnection_reason'])
+        _logger.info(f"Motivos de desconexión traducidos: {traducidas}")
+        return traducidas
 
     # Computa el campo status_var basado en call_status
     @api.depends('call_status')
     def _compute_status_var(self):
-        allowed = set(dict(self._fields['status_var'].selection).keys())
         for record in self:
-            if record.call_status in allowed:
+            if record.call_status in STATUS_VAR_VALUES:
                 record.status_var = record.call_status
             else:
                 record.status_var = False
\ No newline at end of file
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+class RetainCallAgent(models.Model):
+    """Agente de Retell: un registro por nombre, enlazado desde cada llamada (agent_id)"""
+    _name = 'retain.call.agent'
+    _description = 'Agente de Llamadas'
+    _order = 'name'
+
+    name = fields.Char(string='Nombre del agente', required=True)
+    settings_ids = fields.Many2many('llamada.settings', 'llamada_settings_retain_call_agent_rel',
+                                    'retain_call_agent_id', 'llamada_settings_id', string='Personas vinculadas')
+
+    _sql_constraints = [
+        ('name_unique', 'unique(name)', 'Ya existe un agente con este nombre.'),
+    ]
+
+    # Devuelve {nombre: id} creando los agentes que falten con un solo INSERT
+    # (ON CONFLICT evita duplicados si dos procesos crean el mismo agente a la vez)
+    @api.model
+    def _get_or_create_ids(self, names):
+        names = sorted({name for name in names if name})
+        if not names:
+            return {}
+        self.env.cr.execute("""
+            INSERT INTO retain_call_agent (name, create_uid, create_date, write_uid, write_date)
+            SELECT name, %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM unnest(%(names)s::varchar[]) AS name
+                ON CONFLICT (name) DO NOTHING
+        """, {'names': names, 'uid': self.env.uid})
+        self.env.cr.execute("SELECT name, id FROM retain_call_agent WHERE name = ANY(%s)", [names])
+        return dict(self.env.cr.fetchall())
+
+    # Crea los agentes del historial existente y enlaza las llamadas que aún no tienen agent_id
+    @api.model
+    def _backfill_from_history(self):
+        self.env['retain.call.history'].flush_model(['agent_name', 'agent_id'])
+        self.env.cr.execute("""
+            INSERT INTO retain_call_agent (name, create_uid, create_date, write_uid, write_date)
+            SELECT DISTINCT agent_name, %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM retain_call_history
+             WHERE agent_name IS NOT NULL AND agent_name != ''
+                ON CONFLICT (name) DO NOTHING
+        """, {'uid': self.env.uid})
+        self.env.cr.execute("""
+            UPDATE retain_call_history h
+               SET agent_id = a.id
+              FROM retain_call_agent a
+             WHERE h.agent_id IS NULL AND h.agent_name = a.name
+        """)
+        if self.env.cr.rowcount:
+            _logger.info(f"Llamadas enlazadas a su agente: {self.env.cr.rowcount}")
+        self.env['retain.call.history'].invalidate_model(['agent_id'])
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from datetime import timedelta
+from .llamada import CALL_STATUS_SELECTION, BATCH_SIZE
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Antigüedad (días desde call_date) a partir de la cual una llamada pasa al archivo; 0 lo
+# desactiva. Desactivado por defecto: el administrador lo activa con el parámetro
+ARCHIVE_AFTER_DAYS_PARAM = 'retain_call_history.archive_after_days'
+ARCHIVE_AFTER_DAYS_DEFAULT = 0
+# Campos del historial que se conservan en el archivo (la transcripción se copia comprimida aparte)
+ARCHIVE_FIELDS = (
+    'sequence', 'name', 'phone', 'call_status', 'call_date', 'duration', 'duration_ms', 'direction',
+    'from_number', 'to_number', 'agent_name', 'disconnection_reason', 'call_id', 'description_llamada',
+    'payload_hash', 'has_transcription',
+)
+
+class RetainCallArchive(models.Model):
+    """Llamadas antiguas fuera de la tabla principal. Guarda los campos de resumen y la
+    transcripción tal como estaba comprimida; se pueden consultar y devolver al historial."""
+    _name = 'retain.call.archive'
+    _description = 'Archivo de Llamadas'
+    _order = 'call_date desc'
+    _rec_name = 'sequence'
+
+    sequence = fields.Char(string='Número de Llamada', readonly=True)
+    name = fields.Char(string='Nombre del Contacto', readonly=True)
+    phone = fields.Char(string='Teléfono', readonly=True)
+    call_status = fields.Selection(CALL_STATUS_SELECTION, string='Estado', readonly=True)
+    call_date = fields.Datetime(string='Fecha y hora de la llamada', readonly=True, index=True)
+    duration = fields.Float(string='Duración (minutos)', readonly=True)
+    duration_ms = fields.Integer(string='Duración (ms)', readonly=True)
+    direction = fields.Selection([
+        ('inbound', 'Entrante'),
+        ('outbound', 'Saliente')
+    ], string='Dirección de la llamada', readonly=True)
+    from_number = fields.Char(string='Número origen', readonly=True)
+    to_number = fields.Char(string='Número destino', readonly=True)
+    agent_name = fields.Char(string='Nombre del agente', readonly=True, index=True)
+    disconnection_reason = fields.Char(string='Motivo de desconexión', readonly=True)
+    call_id = fields.Char(string='ID de Llamada Retell', readonly=True)
+    description_llamada = fields.Text(string='Descripción de la llamada', readonly=True)
+    payload_hash = fields.Char(string='Huella del payload de Retell', readonly=True)
+    has_transcription = fields.Boolean(string='Tiene transcripción', readonly=True)
+    transcript_codec = fields.Char(string='Compresión', readonly=True)
+    transcript_text_data = fields.Binary(string='Texto comprimido', attachment=False, readonly=True)
+    transcript_turns_data = fields.Binary(string='Turnos comprimidos', attachment=False, readonly=True)
+    transcription = fields.Text(string='Transcripción de la llamada', compute='_compute_transcription')
+    archived_at = fields.Datetime(string='Archivada el', default=fields.Datetime.now, readonly=True)
+
+    _sql_constraints = [
+        ('call_id_unique', 'unique(call_id)', 'Esta llamada ya está en el archivo.'),
+    ]
+
+    # Se descomprime sólo al abrir la llamada
+    def _compute_transcription(self):
+        Transcript = self.env['retain.call.transcript']
+        for archive in self:
+            raw = archive.with_context(bin_size=False)
+            archive.transcription = Transcript._text_from_raw(
+                raw.transcript_codec, raw.transcript_text_data, raw.transcript_turns_data
+            ) or False
+
+    # call_ids que están en el archivo (la sincronización no debe volver a crearlos)
+    @api.model
+    def _get_archived_call_ids(self, call_ids):
+        if not call_ids:
+            return set()
+        self.flush_model(['call_id'])
+        self.env.cr.execute("SELECT call_id FROM retain_call_archive WHERE call_id IN %s", [tuple(call_ids)])
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    # Mueve al archivo, por lotes y con un commit por lote, las llamadas más antiguas que el límite
+    @api.model
+    def _cron_archive_old_calls(self):
+        after_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            ARCHIVE_AFTER_DAYS_PARAM, ARCHIVE_AFTER_DAYS_DEFAULT
+        ))
+        if after_days <= 0:
+            return 0
+        cutoff = fields.Datetime.now() - timedelta(days=after_days)
+        History = self.env['retain.call.history']
+        archivadas = 0
+        while True:
+            llamadas = History.search([('call_date', '<', cutoff)], order='call_date, id', limit=BATCH_SIZE)
+            if not llamadas:
+                break
+            self._archive_calls(llamadas)
+            archivadas += len(llamadas)
+            self.env.cr.commit()
+            self.env.invalidate_all()
+        if archivadas:
+            _logger.info(f"Archivo: {archivadas} llamadas anteriores a {cutoff} movidas al archivo")
+        return archivadas
+
+    # Copia las llamadas al archivo (con la transcripción sin descomprimir) y las borra del historial
+    @api.model
+    def _archive_calls(self, llamadas):
+        transcripts = {
+            transcript.call_history_id.id: transcript
+            for transcript in self.env['retain.call.transcript'].with_context(bin_size=False).search([
+                ('call_history_id', 'in', llamadas.ids)
+            ])
+        }
+        vals_list = []
+        for values in llamadas.read(list(ARCHIVE_FIELDS)):
+            transcript = transcripts.get(values.pop('id'))
+            if transcript:
+                values.update(
+                    transcript_codec=transcript.codec,
+                    transcript_text_data=transcript.text_data,
+                    transcript_turns_data=transcript.turns_data,
+                )
+            vals_list.append(values)
+        self.create(vals_list)
+        llamadas._unlink_for_archive()
+
+    # Devuelve las llamadas archivadas al historial
+    def action_restore(self):
+        History = self.env['retain.call.history']
+        existentes = History.search([('call_id', 'in', self.mapped('call_id'))])
+        if existentes:
+            raise UserError("Algunas llamadas ya existen en el historial: %s" % ', '.join(existentes.mapped('call_id')))
+        archives = self.with_context(bin_size=False)
+        for start in range(0, len(archives), BATCH_SIZE):
+            lote = archives[start:start + BATCH_SIZE]
+            vals_list = [
+                {field: archive[field] for field in ARCHIVE_FIELDS if field != 'has_transcription'}
+                for archive in lote
+            ]
+            llamadas = History.create(vals_list)
+            self.env['retain.call.transcript'].create([{
+                'call_history_id': llamada.id,
+                'codec': archive.transcript_codec,
+                'text_data': archive.transcript_text_data,
+                'turns_data': archive.transcript_turns_data,
+            } for archive, llamada in zip(lote, llamadas) if archive.transcript_codec])
+            con_transcripcion = set(lote.filtered('has_transcription').mapped('call_id'))
+            llamadas.filtered(lambda llamada: llamada.call_id in con_transcripcion).write({'has_transcription': True})
+        self.unlink()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Llamadas devueltas al historial.',
+                'type': 'success',
+                'sticky': False,
+            }
+        }
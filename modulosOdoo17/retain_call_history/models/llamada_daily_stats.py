@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from datetime import timedelta
+import logging
+
+from .llamada import CALL_STATUS_SELECTION
+
+_logger = logging.getLogger(__name__)
+
+# Margen que se resta a la marca del último refresco: write_date es la hora de inicio de la
+# transacción que escribe, así que una transacción larga que confirme después del refresco
+# deja filas con write_date anterior a la marca
+DAILY_STATS_SAFETY_MARGIN = timedelta(minutes=5)
+
+class RetainCallDailyStats(models.Model):
+    """Resumen diario del historial (incluido el archivo) por agente, dirección, estado y motivo de desconexión.
+    La tabla la mantiene _refresh_days con SQL; los informes no agrupan la tabla de llamadas."""
+    _name = 'retain.call.daily.stats'
+    _description = 'Resumen Diario de Llamadas'
+    _order = 'date desc, agent_name'
+
+    date = fields.Date(string='Día', readonly=True, index=True)
+    agent_name = fields.Char(string='Agente', readonly=True)
+    direction = fields.Selection([
+        ('inbound', 'Entrante'),
+        ('outbound', 'Saliente')
+    ], string='Dirección', readonly=True)
+    call_status = fields.Selection(CALL_STATUS_SELECTION, string='Estado', readonly=True)
+    disconnection_reason = fields.Char(string='Motivo de desconexión', readonly=True)
+    call_count = fields.Integer(string='Llamadas', readonly=True)
+    duration_ms_total = fields.Float(string='Duración total (ms)', readonly=True)
+    duration_ms_avg = fields.Float(string='Duración media (ms)', readonly=True, group_operator='avg')
+
+    # Recalcula las filas de los días indicados (fechas UTC de call_date); days=None lo recalcula todo
+    @api.model
+    def _refresh_days(self, days=None):
+        cr = self.env.cr
+        self.env['retain.call.history'].flush_model()
+        self.env['retain.call.archive'].flush_model()
+        where, params = "call_date IS NOT NULL", {'uid': self.env.uid}
+        if days is not None:
+            days = sorted(set(days))
+            if not days:
+                return
+            # El rango permite usar el índice de call_date; la lista filtra los días intermedios
+            where += " AND call_date >= %(first)s AND call_date < %(last)s AND call_date::date = ANY(%(days)s)"
+            params.update(first=days[0], last=days[-1] + timedelta(days=1), days=days)
+            cr.execute("DELETE FROM retain_call_daily_stats WHERE date = ANY(%s)", [days])
+        else:
+            cr.execute("DELETE FROM retain_call_daily_stats")
+        cr.execute(f"""
+            INSERT INTO retain_call_daily_stats (
+                date, agent_name, direction, call_status, disconnection_reason,
+                call_count, duration_ms_total, duration_ms_avg,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT call_date::date, agent_name, direction, call_status, disconnection_reason,
+                   count(*), sum(coalesce(duration_ms, 0)), avg(coalesce(duration_ms, 0)),
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM (
+                    SELECT call_date, agent_name, direction, call_status, disconnection_reason, duration_ms
+                      FROM retain_call_history
+                     WHERE {where}
+                    UNION ALL
+                    SELECT call_date, agent_name, direction, call_status, disconnection_reason, duration_ms
+                      FROM retain_call_archive
+                     WHERE {where}
+                   ) AS calls
+          GROUP BY call_date::date, agent_name, direction, call_status, disconnection_reason
+        """, params)
+        self.invalidate_model()
+        _logger.info(f"Resumen diario actualizado: {len(days) if days is not None else 'todos los'} días")
+
+    # Recalcula los días con llamadas creadas o modificadas desde el último refresco
+    @api.model
+    def _refresh_changed(self):
+        state = self.env['retain.call.sync.state']._get_state()
+        self.env['retain.call.history'].flush_model()
+        refreshed_at = self._get_refresh_mark()
+        if not state.daily_stats_refreshed_at:
+            self._refresh_days()
+        else:
+            self.env.cr.execute("""
+                SELECT DISTINCT call_date::date
+                  FROM retain_call_history
+                 WHERE write_date >= %s AND call_date IS NOT NULL
+            """, [state.daily_stats_refreshed_at])
+            self._refresh_days([row[0] for row in self.env.cr.fetchall()])
+        state.daily_stats_refreshed_at = refreshed_at
+
+    # Reconstrucción completa (instalación o a petición de un administrador)
+    @api.model
+    def action_refresh_all(self):
+        refreshed_at = self._get_refresh_mark()
+        self._refresh_days()
+        self.env['retain.call.sync.state']._get_state().daily_stats_refreshed_at = refreshed_at
+
+    # Marca del refresco: hora real (no la de inicio de la transacción) menos el margen
+    @api.model
+    def _get_refresh_mark(self):
+        self.env.cr.execute("SELECT clock_timestamp() at time zone 'UTC'")
+        return self.env.cr.fetchone()[0] - DAILY_STATS_SAFETY_MARGIN
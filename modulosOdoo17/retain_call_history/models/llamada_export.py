@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Filas leídas de la base de datos por consulta (la memoria no depende del total exportado)
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_COLUMNS = (
+    'sequence', 'call_id', 'call_date', 'agent_name', 'direction', 'call_status', 'duration_ms',
+    'from_number', 'to_number', 'disconnection_reason', 'description_llamada',
+)
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+# Bloque en el que se envía al navegador un fichero ya generado
+EXPORT_STREAM_BLOCK_SIZE = 1024 * 1024
+# Campos que determinan el contenido del fichero: si cambian, el fichero generado ya no vale
+EXPORT_FILTER_FIELDS = ('date_from', 'date_to', 'agent_ids', 'export_format', 'include_transcription')
+
+class RetainCallExport(models.Model):
+    """Exportación masiva del historial (CSV, JSONL o Parquet) por rango de fechas y agentes.
+    Se descarga en streaming desde /retain_call_history/export/<id> o se genera en segundo plano."""
+    _name = 'retain.call.export'
+    _description = 'Exportación de Llamadas'
+    _order = 'id desc'
+
+    name = fields.Char(string='Nombre', compute='_compute_name', store=True)
+    date_from = fields.Datetime(string='Desde')
+    date_to = fields.Datetime(string='Hasta')
+    agent_ids = fields.Many2many('retain.call.agent', string='Agentes')
+    export_format = fields.Selection([
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+        ('parquet', 'Parquet'),
+    ], string='Formato', default='csv', required=True)
+    include_transcription = fields.Boolean(string='Incluir transcripción', default=True)
+    state = fields.Selection([
+        ('draft', 'Borrador'),
+        ('queued', 'En cola'),
+        ('running', 'En curso'),
+        ('done', 'Completada'),
+        ('failed', 'Fallida'),
+    ], string='Estado', default='draft', required=True, readonly=True)
+    user_id = fields.Many2one('res.users', string='Solicitada por', default=lambda self: self.env.user, readonly=True)
+    attachment_id = fields.Many2one('ir.attachment', string='Fichero', readonly=True, ondelete='set null')
+    row_count = fields.Integer(string='Llamadas exportadas', readonly=True)
+    message = fields.Text(string='Resultado', readonly=True)
+
+    @api.depends('export_format', 'create_date')
+    def _compute_name(self):
+        for export in self:
+            fecha = fields.Datetime.to_string(export.create_date or fields.Datetime.now())
+            export.name = f"llamadas_{fecha.replace(' ', '_').replace(':', '')}.{export.export_format}"
+
+    @api.constrains('export_format')
+    def _check_export_format(self):
+        if not pyarrow and 'parquet' in self.mapped('export_format'):
+            raise ValidationError("Para exportar en Parquet hay que instalar el paquete pyarrow.")
+
+    # Al cambiar los filtros se descarta el fichero generado con los anteriores
+    def write(self, vals):
+        res = super().write(vals)
+        if any(fname in vals for fname in EXPORT_FILTER_FIELDS):
+            stale = self.filtered('attachment_id')
+            if stale:
+                attachments = stale.attachment_id
+                stale.write({'attachment_id': False, 'row_count': 0, 'state': 'draft'})
+                attachments.sudo().unlink()
+        return res
+
+    def _get_columns(self):
+        self.ensure_one()
+        return EXPORT_COLUMNS + (('transcription',) if self.include_transcription else ())
+
+    # Lee las llamadas que cumplen los filtros por bloques (paginación por id, sin OFFSET)
+    # y devuelve cada bloque como lista de diccionarios
+    def _iter_row_chunks(self):
+        self.ensure_one()
+        self.env['retain.call.history'].check_access_rights('read')
+        Transcript = self.env['retain.call.transcript']
+        where, params = ["h.id > %(last_id)s"], {'limit': EXPORT_CHUNK_SIZE, 'last_id': 0}
+        if self.date_from:
+            where.append("h.call_date >= %(date_from)s")
+            params['date_from'] = self.date_from
+        if self.date_to:
+            where.append("h.call_date <= %(date_to)s")
+            params['date_to'] = self.date_to
+        if self.agent_ids:
+            where.append("h.agent_id = ANY(%(agent_ids)s)")
+            params['agent_ids'] = self.agent_ids.ids
+        transcript_cols = ", t.codec, t.text_data, t.turns_data" if self.include_transcription else ""
+        transcript_join = ("LEFT JOIN retain_call_transcript t ON t.call_history_id = h.id"
+                           if self.include_transcription else "")
+        query = f"""
+            SELECT h.id, {', '.join('h.' + column for column in EXPORT_COLUMNS)}{transcript_cols}
+              FROM retain_call_history h
+              {transcript_join}
+             WHERE {' AND '.join(where)}
+          ORDER BY h.id
+             LIMIT %(limit)s
+        """
+        self.env['retain.call.history'].flush_model()
+        while True:
+            self.env.cr.execute(query, params)
+            rows = self.env.cr.fetchall()
+            if not rows:
+                break
+            chunk = []
+            for row in rows:
+                values = dict(zip(EXPORT_COLUMNS, row[1:len(EXPORT_COLUMNS) + 1]))
+                values['call_date'] = fields.Datetime.to_string(values['call_date']) or ''
+                if self.include_transcription:
+                    codec, text_data, turns_data = row[len(EXPORT_COLUMNS) + 1:]
+                    values['transcription'] = Transcript._text_from_raw(codec, text_data, turns_data)
+                chunk.append(values)
+            params['last_id'] = rows[-1][0]
+            yield chunk
+
+    # Convierte un bloque de filas en bytes del formato de texto elegido (CSV o JSONL)
+    def _encode_chunk(self, chunk, columns, header=False):
+        if self.export_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=columns)
+            if header:
+                writer.writeheader()
+            writer.writerows(chunk)
+            return buffer.getvalue().encode('utf-8')
+        return ''.join(json.dumps(values, ensure_ascii=False) + '\n' for values in chunk).encode('utf-8')
+
+    # Bytes del fichero según se generan, para enviarlos sin esperar al final (CSV y JSONL)
+    def _iter_blocks(self):
+        self.ensure_one()
+        columns = self._get_columns()
+        yield self._encode_chunk([], columns, header=True)
+        for chunk in self._iter_row_chunks():
+            yield self._encode_chunk(chunk, columns)
+
+    # Escribe la exportación en un fichero temporal; devuelve (ruta, sha1, tamaño, filas).
+    # Parquet necesita el fichero completo (metadatos al final) antes de poder enviarse.
+    def _write_file(self):
+        self.ensure_one()
+        fd, path = tempfile.mkstemp(prefix='retain_export_', suffix=f'.{self.export_format}')
+        sha1 = hashlib.sha1()
+        row_count = 0
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                if self.export_format == 'parquet':
+                    row_count = self._write_parquet(output)
+                else:
+                    columns = self._get_columns()
+                    header = self._encode_chunk([], columns, header=True)
+                    sha1.update(header)
+                    output.write(header)
+                    for chunk in self._iter_row_chunks():
+                        block = self._encode_chunk(chunk, columns)
+                        sha1.update(block)
+                        output.write(block)
+                        row_count += len(chunk)
+            if self.export_format == 'parquet':
+                with open(path, 'rb') as written:
+                    for block in iter(lambda: written.read(EXPORT_STREAM_BLOCK_SIZE), b''):
+                        sha1.update(block)
+        except Exception:
+            os.unlink(path)
+            raise
+        return path, sha1.hexdigest(), os.path.getsize(path), row_count
+
+    def _write_parquet(self, output):
+        columns = self._get_columns()
+        schema = pyarrow.schema([
+            (column, pyarrow.int64() if column == 'duration_ms' else pyarrow.string()) for column in columns
+        ])
+        row_count = 0
+        with pyarrow.parquet.ParquetWriter(output, schema, compression='zstd') as writer:
+            for chunk in self._iter_row_chunks():
+                writer.write_table(pyarrow.Table.from_pylist(chunk, schema=schema))
+                row_count += len(chunk)
+        return row_count
+
+    # Guarda el fichero como adjunto. Con almacenamiento en filestore se mueve el fichero
+    # directamente en lugar de cargarlo en memoria para pasarlo como datos del adjunto.
+    def _store_attachment(self, path, checksum, size):
+        self.ensure_one()
+        Attachment = self.env['ir.attachment'].sudo()
+        vals = {
+            'name': self.name,
+            'type': 'binary',
+            'mimetype': EXPORT_MIMETYPES[self.export_format],
+            'res_model': self._name,
+            'res_id': self.id,
+        }
+        if Attachment._storage() == 'file':
+            store_fname = f"{checksum[:2]}/{checksum}"
+            full_path = Attachment._full_path(store_fname)
+            # Como _file_write: si la transacción se deshace, el GC del filestore borra el fichero
+            Attachment._mark_for_gc(store_fname)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if os.path.exists(full_path):
+                os.unlink(path)
+            else:
+                shutil.move(path, full_path)
+            vals.update(store_fname=store_fname, checksum=checksum, file_size=size)
+        else:
+            with open(path, 'rb') as exported:
+                vals['raw'] = exported.read()
+            os.unlink(path)
+        return Attachment.create(vals)
+
+    # Encola la exportación para generarla en segundo plano como adjunto
+    def action_run_background(self):
+        self.write({'state': 'queued', 'message': False})
+        self.env.ref('retain_call_history.cron_process_exports').sudo()._trigger()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Exportación en cola. El fichero aparecerá en la exportación al terminar.',
+                'type': 'info',
+                'sticky': False,
+            }
+        }
+
+    # Descarga directa: el fichero se genera mientras se envía
+    def action_download(self):
+        self.ensure_one()
+        if self.attachment_id:
+            url = f"/web/content/{self.attachment_id.id}?download=true"
+        else:
+            url = f"/retain_call_history/export/{self.id}"
+        return {
+            'type': 'ir.actions.act_url',
+            'url': url,
+            'target': 'self',
+        }
+
+    @api.model
+    def _cron_process_exports(self):
+        while True:
+            export = self.search([('state', '=', 'queued')], order='id', limit=1)
+            if not export:
+                break
+            export.write({'state': 'running'})
+            self.env.cr.commit()
+            try:
+                export = export.with_user(export.user_id)
+                path, checksum, size, row_count = export._write_file()
+                attachment = export._store_attachment(path, checksum, size)
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.error(f"Error en la exportación {export.id}: {e}")
+                export.sudo().write({'state': 'failed', 'message': str(e)})
+            else:
+                export.sudo().write({'state': 'done', 'attachment_id': attachment.id, 'row_count': row_count})
+            self.env.cr.commit()
@@ -2,6 +2,7 @@
 
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+from odoo.tools import sql
 
 class LlamadaSettings(models.Model):
     _name = 'llamada.settings'
@@ -9,41 +10,41 @@ class LlamadaSettings(models.Model):
 
     # Campos principales
     name = fields.Many2one('res.partner', string='Persona', required=True)
-    agent_name = fields.Many2many('retain.call.history', string='Agentes asignados')
+    agent_name = fields.Many2many('retain.call.agent', 'llamada_settings_retain_call_agent_rel',
+                                  'llamada_settings_id', 'retain_call_agent_id', string='Agentes asignados')
     agent_names_display = fields.Char(string='Nombres de agentes', compute='_compute_agent_names_display', store=False)
 
-    # Mostrar los nombres únicos de agentes asignados en la vista lista
+    # Una sola fila de ajustes por persona: así un agente no puede asignarse dos veces a la misma
+    # persona (dentro de una fila ya lo impide la tabla de relación)
+    _sql_constraints = [
+        ('partner_unique', 'unique(name)', 'Esta persona ya tiene agentes asignados.'),
+    ]
+
+    # Mostrar los nombres de agentes asignados en la vista lista
     @api.depends('agent_name')
     def _compute_agent_names_display(self):
         for record in self:
-            unique_agent_names = list(set(record.agent_name.mapped('agent_name')))
-            unique_agent_names = [agent_name for agent_name in unique_agent_names if agent_name]
-            record.agent_names_display = ', '.join(unique_agent_names) if unique_agent_names else ''
-
-    # Validación automática para evitar agentes duplicados
-    @api.constrains('agent_name')
-    def _check_unique_agents(self):
-        for record in self:
-            if record.agent_name:
-                agent_names = record.agent_name.mapped('agent_name')
-                agent_names = [agent_name for agent_name in agent_names if agent_name]
+            record.agent_names_display = ', '.join(record.agent_name.mapped('name'))
 
+    # Pasa los vínculos antiguos (persona -> llamadas) a vínculos persona -> agente
+    @api.model
+    def _migrate_agent_links(self):
+        cr = self.env.cr
+        if not sql.table_exists(cr, 'llamada_settings_retain_call_history_rel'):
+            return
+        cr.execute("""
+            INSERT INTO llamada_settings_retain_call_agent_rel (llamada_settings_id, retain_call_agent_id)
+            SELECT DISTINCT rel.llamada_settings_id, h.agent_id
+              FROM llamada_settings_retain_call_history_rel rel
+              JOIN retain_call_history h ON h.id = rel.retain_call_history_id
+             WHERE h.agent_id IS NOT NULL
+                ON CONFLICT DO NOTHING
+        """)
+        cr.execute("DROP TABLE llamada_settings_retain_call_history_rel")
+        self.invalidate_model(['agent_name'])
 
     # Acción para mostrar notificación al guardar andres.torres@demo.com
     def action_save_agents(self):
-        agent_names = self.agent_name.mapped('agent_name')
-        agent_names = [agent_name for agent_name in agent_names if agent_name]
-        if len(agent_names) != len(set(agent_names)):
-            mensaje = 'No se puede asignar el mismo agente dos veces a una persona.'
-            return {
-                'type': 'ir.actions.client',
-                'tag': 'display_notification',
-                'params': {
-                    'title': mensaje,
-                    'type': 'danger',
-                    'sticky': False,
-                }
-            }
         self.ensure_one()
         self.write({'agent_name': [(6, 0, self.agent_name.ids)]})
         mensaje = 'Agentes correctamente asignados.'
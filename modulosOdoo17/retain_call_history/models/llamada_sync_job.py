@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import logging
+import tracemalloc
+
+_logger = logging.getLogger(__name__)
+
+# Clave del advisory lock de PostgreSQL que impide dos sincronizaciones a la vez
+SYNC_ADVISORY_LOCK_KEY = 7305117201
+
+class RetainCallSyncJob(models.Model):
+    _name = 'retain.call.sync.job'
+    _description = 'Sincronización de Llamadas con Retell'
+    _order = 'id desc'
+
+    full = fields.Boolean(string='Resincronización completa', readonly=True)
+    state = fields.Selection([
+        ('queued', 'En cola'),
+        ('running', 'En curso'),
+        ('done', 'Completada'),
+        ('failed', 'Fallida'),
+    ], string='Estado', default='queued', required=True, readonly=True)
+    user_id = fields.Many2one('res.users', string='Solicitada por', default=lambda self: self.env.user, readonly=True)
+    date_start = fields.Datetime(string='Inicio', readonly=True)
+    date_end = fields.Datetime(string='Fin', readonly=True)
+    pages_fetched = fields.Integer(string='Páginas descargadas', readonly=True)
+    calls_fetched = fields.Integer(string='Llamadas descargadas', readonly=True)
+    calls_created = fields.Integer(string='Llamadas nuevas', readonly=True)
+    calls_updated = fields.Integer(string='Llamadas con cambios', readonly=True)
+    calls_skipped = fields.Integer(string='Llamadas sin cambios', readonly=True)
+    details_fetched = fields.Integer(string='Detalles consultados', readonly=True)
+    transcriptions_added = fields.Integer(string='Transcripciones añadidas', readonly=True)
+    agents_added = fields.Integer(string='Agentes añadidos', readonly=True)
+    errors_count = fields.Integer(string='Errores', readonly=True)
+    message = fields.Text(string='Resultado', readonly=True)
+    # Tiempos por etapa (segundos)
+    duration_total = fields.Float(string='Duración total (s)', digits=(16, 2), readonly=True, group_operator='avg')
+    duration_fetch = fields.Float(string='Descarga del listado (s)', digits=(16, 2), readonly=True, group_operator='avg')
+    duration_process = fields.Float(string='Procesado (s)', digits=(16, 2), readonly=True, group_operator='avg')
+    duration_upsert = fields.Float(string='Escritura (s)', digits=(16, 2), readonly=True, group_operator='avg')
+    duration_enrich = fields.Float(string='Enriquecimiento (s)', digits=(16, 2), readonly=True, group_operator='avg')
+    # Consultas SQL por etapa y pico de memoria del proceso
+    sql_queries_fetch = fields.Integer(string='Consultas SQL (descarga)', readonly=True)
+    sql_queries_process = fields.Integer(string='Consultas SQL (procesado)', readonly=True)
+    sql_queries_upsert = fields.Integer(string='Consultas SQL (escritura)', readonly=True)
+    sql_queries_enrich = fields.Integer(string='Consultas SQL (enriquecimiento)', readonly=True)
+    peak_memory_mb = fields.Float(string='Pico de memoria (MB)', digits=(16, 1), readonly=True, group_operator='max')
+    # Peticiones a la API de Retell
+    api_requests = fields.Integer(string='Peticiones a Retell', readonly=True)
+    api_errors = fields.Integer(string='Errores de Retell', readonly=True)
+    api_retries = fields.Integer(string='Reintentos', readonly=True)
+    api_latency_avg_ms = fields.Float(string='Latencia media (ms)', readonly=True, group_operator='avg')
+    api_latency_p50_ms = fields.Float(string='Latencia p50 (ms)', readonly=True, group_operator='avg')
+    api_latency_p95_ms = fields.Float(string='Latencia p95 (ms)', readonly=True, group_operator='avg')
+    api_latency_p99_ms = fields.Float(string='Latencia p99 (ms)', readonly=True, group_operator='avg')
+    api_latency_max_ms = fields.Float(string='Latencia máxima (ms)', readonly=True, group_operator='max')
+    # Estado del historial al terminar
+    total_calls = fields.Integer(string='Llamadas en el historial', readonly=True, group_operator='max')
+    calls_with_transcription = fields.Integer(string='Con transcripción', readonly=True, group_operator='max')
+    calls_with_agent = fields.Integer(string='Con agente', readonly=True, group_operator='max')
+
+    @api.depends('create_date', 'full')
+    def _compute_display_name(self):
+        for job in self:
+            tipo = 'Completa' if job.full else 'Incremental'
+            job.display_name = f"{tipo} - {fields.Datetime.to_string(job.create_date) or ''}"
+
+    # Valores de las métricas por etapa (retain.call.history._new_sync_metrics) y de
+    # RetellClient.get_stats() para guardar en el job
+    @api.model
+    def _metrics_vals(self, metrics, api_stats):
+        timings, queries = metrics['time'], metrics['queries']
+        return {
+            'duration_fetch': timings['fetch'],
+            'duration_process': timings['process'],
+            'duration_upsert': timings['upsert'],
+            'duration_enrich': timings['enrich'],
+            'sql_queries_fetch': queries['fetch'],
+            'sql_queries_process': queries['process'],
+            'sql_queries_upsert': queries['upsert'],
+            'sql_queries_enrich': queries['enrich'],
+            # Pico de memoria Python desde el inicio de la ejecución (reset_peak en _sincronizar_historial)
+            'peak_memory_mb': tracemalloc.get_traced_memory()[1] / (1024.0 * 1024.0),
+            'api_requests': api_stats['requests'],
+            'api_errors': api_stats['errors'],
+            'api_retries': api_stats['retries'],
+            'api_latency_avg_ms': api_stats['latency_avg_ms'],
+            'api_latency_p50_ms': api_stats['latency_p50_ms'],
+            'api_latency_p95_ms': api_stats['latency_p95_ms'],
+            'api_latency_p99_ms': api_stats['latency_p99_ms'],
+            'api_latency_max_ms': api_stats['latency_max_ms'],
+        }
+
+    # Intenta tomar el advisory lock de sesión (se mantiene entre commits)
+    def _try_sync_lock(self):
+        self.env.cr.execute("SELECT pg_try_advisory_lock(%s)", [SYNC_ADVISORY_LOCK_KEY])
+        return self.env.cr.fetchone()[0]
+
+    def _release_sync_lock(self):
+        self.env.cr.execute("SELECT pg_advisory_unlock(%s)", [SYNC_ADVISORY_LOCK_KEY])
+
+    # Crea un job en cola (si no hay otro pendiente) y despierta al cron que los procesa
+    @api.model
+    def _enqueue(self, full=False):
+        pending = self.search([('state', 'in', ('queued', 'running'))], limit=1)
+        if pending:
+            return pending, False
+        job = self.create({'full': full})
+        self.env.ref('retain_call_history.cron_process_sync_jobs').sudo()._trigger()
+        return job, True
+
+    # Acción del botón "Sincronizar": encola y avisa sin esperar a que termine
+    @api.model
+    def action_enqueue(self, full=False):
+        job, created = self._enqueue(full=full)
+        if created:
+            title, notification_type = 'Sincronización en cola. Puedes seguir su progreso en Sincronizaciones.', 'info'
+        else:
+            title, notification_type = 'Ya hay una sincronización en curso.', 'warning'
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': title,
+                'type': notification_type,
+                'sticky': False,
+            }
+        }
+
+    # Procesa los jobs en cola de uno en uno mientras se mantenga el lock
+    @api.model
+    def _cron_process_jobs(self):
+        if not self._try_sync_lock():
+            _logger.info("Otra sincronización tiene el lock; se procesará en la siguiente ejecución")
+            return
+        try:
+            # Si tenemos el lock, cualquier job 'running' quedó huérfano (worker caído)
+            self.search([('state', '=', 'running')]).write({
+                'state': 'failed',
+                'date_end': fields.Datetime.now(),
+                'message': 'Interrumpida: el proceso que la ejecutaba terminó inesperadamente.',
+            })
+            self.env.cr.commit()
+            while True:
+                job = self.search([('state', '=', 'queued')], order='id', limit=1)
+                if not job:
+                    break
+                job._run()
+        finally:
+            # Si algo ha fallado la transacción está abortada y el unlock no se ejecutaría;
+            # todo lo que debía quedar ya se ha confirmado con commit
+            self.env.cr.rollback()
+            self._release_sync_lock()
+
+    def _run(self):
+        self.ensure_one()
+        self.write({'state': 'running', 'date_start': fields.Datetime.now()})
+        self.env.cr.commit()
+        try:
+            resumen = self.env['retain.call.history']._sincronizar_historial(full=self.full, job=self)
+        except Exception as e:
+            self.env.cr.rollback()
+            _logger.error(f"Error en sincronización {self.id}: {e}")
+            self.write({'state': 'failed', 'date_end': fields.Datetime.now(), 'message': str(e)})
+        else:
+            self.write({'state': 'done', 'date_end': fields.Datetime.now(), 'message': resumen})
+        self.duration_total = (self.date_end - self.date_start).total_seconds()
+        self.env.cr.commit()
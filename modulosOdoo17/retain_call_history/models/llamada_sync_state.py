@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import json
+
+# Antiguos parámetros donde se guardaba el estado; sólo se leen para migrarlos
+SYNC_LAST_TIMESTAMP_PARAM = 'retain_call_history.sync_last_start_timestamp'
+SYNC_CHECKPOINT_PARAM = 'retain_call_history.sync_checkpoint'
+DAILY_STATS_REFRESHED_AT_PARAM = 'retain_call_history.daily_stats_refreshed_at'
+
+class RetainCallSyncState(models.Model):
+    """Estado de la sincronización con Retell (una sola fila): marca de agua, punto de
+    reanudación y último refresco del resumen diario. Se guarda aquí y no en ir.config_parameter porque cada escritura de un
+    parámetro vacía la caché del registro, y estos valores cambian en cada página."""
+    _name = 'retain.call.sync.state'
+    _description = 'Estado de la Sincronización con Retell'
+
+    # Milisegundos desde epoch: no caben en un Integer (int4)
+    last_start_timestamp = fields.Float(string='Último start_timestamp sincronizado', digits=(16, 0), readonly=True)
+    checkpoint = fields.Json(string='Punto de reanudación', readonly=True)
+    # Momento (write_date) hasta el que el resumen diario refleja los cambios del historial
+    daily_stats_refreshed_at = fields.Datetime(string='Resumen diario actualizado hasta', readonly=True)
+
+    # Devuelve la fila de estado; la crea la primera vez con lo que hubiera en los parámetros
+    @api.model
+    def _get_state(self):
+        state = self.sudo().search([], limit=1)
+        if state:
+            return state
+        params = self.env['ir.config_parameter'].sudo()
+        try:
+            checkpoint = json.loads(params.get_param(SYNC_CHECKPOINT_PARAM) or 'null')
+        except ValueError:
+            checkpoint = None
+        return self.sudo().create({
+            'last_start_timestamp': int(params.get_param(SYNC_LAST_TIMESTAMP_PARAM, 0) or 0),
+            'checkpoint': checkpoint or False,
+            'daily_stats_refreshed_at': params.get_param(DAILY_STATS_REFRESHED_AT_PARAM) or False,
+        })
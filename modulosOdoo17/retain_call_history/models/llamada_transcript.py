@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from odoo.tools import sql
+from .llamada import FULLTEXT_CONFIG, BATCH_SIZE
+import json
+import logging
+import zlib
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Primer byte de los datos guardados en base64 por la versión anterior ('e' de zlib, 'K' de
+# zstd); los datos comprimidos en bruto empiezan por 0x78 (zlib) o 0x28 (zstd)
+BASE64_FIRST_BYTES = (ord('e'), ord('K'))
+
+class RetainCallTranscript(models.Model):
+    """Transcripción comprimida de una llamada, fuera de la fila principal del historial"""
+    _name = 'retain.call.transcript'
+    _description = 'Transcripción de Llamada'
+
+    call_history_id = fields.Many2one('retain.call.history', string='Llamada', required=True, ondelete='cascade', index=True)
+    codec = fields.Selection([
+        ('zlib', 'zlib'),
+        ('zstd', 'zstd'),
+    ], string='Compresión', required=True, default=lambda self: self._default_codec())
+    # Bytes comprimidos tal cual en la columna bytea, sin el base64 habitual de los Binary
+    # (no se muestran en ninguna vista); leerlos siempre con bin_size=False
+    text_data = fields.Binary(string='Texto comprimido', attachment=False)
+    turns_data = fields.Binary(string='Turnos comprimidos', attachment=False)
+    turn_count = fields.Integer(string='Turnos')
+    raw_size = fields.Integer(string='Tamaño original (bytes)')
+    compressed_size = fields.Integer(string='Tamaño comprimido (bytes)')
+
+    _sql_constraints = [
+        ('call_history_unique', 'unique(call_history_id)', 'La llamada ya tiene una transcripción.'),
+    ]
+
+    # search_vector (tsvector) no es un campo del ORM: el texto está comprimido y PostgreSQL
+    # no puede leerlo, así que el vector se calcula al guardar desde el texto descomprimido
+    def init(self):
+        cr = self.env.cr
+        if not sql.column_exists(cr, self._table, 'search_vector'):
+            cr.execute(f'ALTER TABLE "{self._table}" ADD COLUMN search_vector tsvector')
+            # Rellena el vector de las transcripciones que ya existían
+            ids = self.search([]).ids
+            for start in range(0, len(ids), BATCH_SIZE):
+                self.browse(ids[start:start + BATCH_SIZE])._update_search_vector()
+        sql.create_index(cr, 'retain_call_transcript_search_vector_index', self._table,
+                         ['search_vector'], method='gin')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._update_search_vector()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'text_data' in vals or 'turns_data' in vals:
+            self._update_search_vector()
+        return res
+
+    def _update_search_vector(self):
+        if not self:
+            return
+        self.env.cr.execute(f"""
+            UPDATE retain_call_transcript t
+               SET search_vector = to_tsvector('{FULLTEXT_CONFIG}', v.body)
+              FROM unnest(%s::int[], %s::text[]) AS v(id, body)
+             WHERE t.id = v.id
+        """, [self.ids, [transcript.get_text() for transcript in self]])
+
+    # Subconsulta (SQL y parámetros) con los ids de las llamadas cuya transcripción coincide
+    # con la consulta; se usa dentro de un dominio para no traer los ids a Python
+    @api.model
+    def _fulltext_match_subquery(self, query):
+        self.flush_model(['call_history_id'])
+        return f"""
+            SELECT call_history_id
+              FROM retain_call_transcript
+             WHERE search_vector @@ websearch_to_tsquery('{FULLTEXT_CONFIG}', %s)
+        """, [query]
+
+    @api.model
+    def _default_codec(self):
+        return 'zstd' if zstandard else 'zlib'
+
+    # Comprime bytes con el códec indicado; devuelve los bytes comprimidos y su tamaño
+    @api.model
+    def _compress(self, data, codec):
+        if codec == 'zstd':
+            compressed = zstandard.ZstdCompressor(level=10).compress(data)
+        else:
+            compressed = zlib.compress(data, 6)
+        return compressed, len(compressed)
+
+    def _decompress(self, value):
+        return self._decompress_raw(self.codec, value)
+
+    # Descomprime un valor leído directamente de la base de datos (p. ej. en exportaciones por SQL)
+    @api.model
+    def _decompress_raw(self, codec, value):
+        if not value:
+            return b''
+        # Las consultas SQL devuelven bytea como memoryview
+        compressed = bytes(value)
+        if codec == 'zstd':
+            if not zstandard:
+                _logger.error("Hay transcripciones en zstd pero el paquete zstandard no está instalado")
+                return b''
+            return zstandard.ZstdDecompressor().decompress(compressed)
+        return zlib.decompress(compressed)
+
+    # Valores de create/write para guardar un texto (y opcionalmente sus turnos) comprimidos
+    @api.model
+    def _prepare_storage_vals(self, text=None, turns=None, codec=None):
+        codec = codec or self._default_codec()
+        vals = {'codec': codec}
+        if text is not None:
+            raw = text.encode('utf-8')
+            # Sin texto se guarda NULL: get_text lo reconstruye desde los turnos
+            vals['text_data'], vals['compressed_size'] = self._compress(raw, codec) if raw else (False, 0)
+            vals['raw_size'] = len(raw)
+        if turns is not None:
+            vals['turns_data'] = self._compress(json.dumps(turns, ensure_ascii=False).encode('utf-8'), codec)[0] if turns else False
+            vals['turn_count'] = len(turns)
+        return vals
+
+    # Texto plano de la transcripción (se reconstruye desde los turnos si no hay texto)
+    def get_text(self):
+        self.ensure_one()
+        # Con bin_size (lo añade el cliente web) los Binary devuelven el tamaño, no los datos
+        transcript = self.with_context(bin_size=False)
+        return self._text_from_raw(transcript.codec, transcript.text_data, transcript.turns_data)
+
+    @api.model
+    def _text_from_raw(self, codec, text_data, turns_data):
+        if text_data:
+            return self._decompress_raw(codec, text_data).decode('utf-8')
+        if not turns_data:
+            return ''
+        turns = json.loads(self._decompress_raw(codec, turns_data).decode('utf-8'))
+        return '\n'.join(f"{turn.get('speaker', '')}: {turn.get('text', '')}" for turn in turns)
+
+    # Turnos estructurados: [{'speaker', 'text', 'start', 'end'}]
+    def get_turns(self):
+        self.ensure_one()
+        transcript = self.with_context(bin_size=False)
+        if not transcript.turns_data:
+            return []
+        return json.loads(transcript._decompress(transcript.turns_data).decode('utf-8'))
+
+    # Pasa a bytes en bruto los datos guardados en base64 por la versión anterior, en las
+    # transcripciones y en el archivo (se reconocen por el primer byte)
+    @api.model
+    def _migrate_base64_storage(self):
+        cr = self.env.cr
+        for table, columns in (
+            ('retain_call_transcript', ('text_data', 'turns_data')),
+            ('retain_call_archive', ('transcript_text_data', 'transcript_turns_data')),
+        ):
+            for column in columns:
+                cr.execute(f"""
+                    UPDATE "{table}"
+                       SET "{column}" = decode(convert_from("{column}", 'UTF8'), 'base64')
+                     WHERE get_byte("{column}", 0) IN %s
+                """, [BASE64_FIRST_BYTES])
+                if cr.rowcount:
+                    _logger.info(f"{table}.{column}: {cr.rowcount} valores pasados de base64 a bytes")
+        self.env.invalidate_all()
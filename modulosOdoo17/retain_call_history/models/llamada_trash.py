@@ -1,6 +1,16 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
+from odoo.exceptions import UserError
 from datetime import timedelta
+from .llamada import CALL_STATUS_SELECTION, BATCH_SIZE, read_for_copy
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Días que se conservan las llamadas en la papelera (ir.config_parameter)
+TRASH_RETENTION_DAYS_PARAM = 'retain_call_history.trash_retention_days'
+TRASH_RETENTION_DAYS_DEFAULT = 7
 
 class RetainCallHistoryTrash(models.Model):
     _name = 'retain.call.history.trash'
@@ -9,19 +19,20 @@ class RetainCallHistoryTrash(models.Model):
     sequence = fields.Char(string='Número de Llamada', readonly=True)
     name = fields.Char(string='Nombre del Contacto', required=True)
     phone = fields.Char(string='Teléfono', required=True)
-    call_status = fields.Selection([
-        ('pending', 'Pendiente'),
+    # Mismos estados que el historial más los valores antiguos de la papelera
+    call_status = fields.Selection(CALL_STATUS_SELECTION + [
         ('in_progress', 'En progreso'),
         ('completed', 'Completada'),
         ('failed', 'Fallida'),
-        ('ended', 'Terminada'),
         ('unknown', 'Desconocida')
     ], string='Estado')
     deletion_date = fields.Datetime(
         string='Fecha de eliminación',
         default=fields.Datetime.now,
-        readonly=True
+        readonly=True,
+        index=True
     )
+    call_date = fields.Datetime(string='Fecha y hora de la llamada')
     description_llamada = fields.Text(string='Descripción de la llamada')
     duration = fields.Float(string='Duración (minutos)')
     duration_ms = fields.Integer(string='Duración (ms)')
@@ -36,28 +47,43 @@ class RetainCallHistoryTrash(models.Model):
     call_id = fields.Char(string='ID de Llamada Retell')
     transcription = fields.Text(string='Transcripción de la llamada')
 
-    # Método para restaurar el registro eliminado
+    # Método para restaurar en bloque los registros eliminados
     def action_restore(self):
-        self.env['retain.call.history'].create({
-            'sequence': self.sequence,
-            'name': self.name,
-            'phone': self.phone,
-            'call_status': self.call_status,
-            'description_llamada': self.description_llamada,
-            'duration': self.duration,
-            'duration_ms': self.duration_ms,
-            'direction': self.direction,
-            'from_number': self.from_number,
-            'to_number': self.to_number,
-            'agent_name': self.agent_name,
-            'disconnection_reason': self.disconnection_reason,
-            'call_id': self.call_id,
-            'transcription': self.transcription,
-        })
+        Llamada = self.env['retain.call.history']
+        existentes = Llamada.search([('call_id', 'in', [c for c in self.mapped('call_id') if c])])
+        if existentes:
+            raise UserError(
+                "Estas llamadas ya existen de nuevo en el historial y no se pueden restaurar:\n"
+                + ", ".join(existentes.mapped('call_id'))
+            )
+        field_names = Llamada._get_trash_field_names()
+        valid_status = {value for value, _label in CALL_STATUS_SELECTION}
+        for start in range(0, len(self), BATCH_SIZE):
+            vals_list = read_for_copy(self[start:start + BATCH_SIZE], field_names)
+            for vals in vals_list:
+                # Los estados antiguos de la papelera no existen en el historial
+                if vals.get('call_status') not in valid_status:
+                    vals.pop('call_status', None)
+            Llamada.create(vals_list)
         self.unlink()
 
-    # Elimina los registros de la papelera que tengan más de 7 días
+    # Elimina los registros de la papelera más antiguos que el periodo de retención,
+    # en lotes con commit entre ellos para no mantener bloqueos largos
     @api.model
     def _cron_delete_old_records(self):
-        deadline = fields.Datetime.now() - timedelta(days=7)
-        self.search([('deletion_date', '<', deadline)]).unlink()
+        retention_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            TRASH_RETENTION_DAYS_PARAM, TRASH_RETENTION_DAYS_DEFAULT
+        ))
+        deadline = fields.Datetime.now() - timedelta(days=retention_days)
+        started = time.monotonic()
+        purgadas = 0
+        while True:
+            lote = self.search([('deletion_date', '<', deadline)], order='id', limit=BATCH_SIZE)
+            if not lote:
+                break
+            lote.unlink()
+            purgadas += len(lote)
+            self.env.cr.commit()
+        _logger.info(f"Papelera: {purgadas} llamadas eliminadas definitivamente en {time.monotonic() - started:.1f}s "
+                     f"(retención {retention_days} días)")
+        return purgadas
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+from datetime import timedelta
+import hashlib
+import hmac
+import json
+import logging
+import re
+import time
+
+from .llamada import RETELL_API_KEY_PARAM
+
+_logger = logging.getLogger(__name__)
+
+# Eventos de Retell que se aceptan en el webhook
+WEBHOOK_EVENTS = ('call_started', 'call_ended', 'call_analyzed')
+# Secreto con el que Retell firma los webhooks (si no se define se usa la API key configurada;
+# sin ninguno de los dos el webhook rechaza todas las peticiones)
+WEBHOOK_SECRET_PARAM = 'retain_call_history.retell_webhook_secret'
+# Margen admitido entre la marca de tiempo de la firma y la hora local
+WEBHOOK_SIGNATURE_TOLERANCE_MS = 5 * 60 * 1000
+WEBHOOK_SIGNATURE_RE = re.compile(r'v=(\d+),d=([0-9a-fA-F]+)')
+WEBHOOK_BATCH_SIZE = 200
+WEBHOOK_MAX_ATTEMPTS = 3
+WEBHOOK_EVENT_RETENTION_DAYS = 7
+
+class RetainCallWebhookEvent(models.Model):
+    """Cola de eventos recibidos desde el webhook de Retell; se aplican desde un cron"""
+    _name = 'retain.call.webhook.event'
+    _description = 'Evento Webhook de Retell'
+    _order = 'id desc'
+
+    event_type = fields.Selection([
+        ('call_started', 'Llamada iniciada'),
+        ('call_ended', 'Llamada finalizada'),
+        ('call_analyzed', 'Llamada analizada'),
+    ], string='Evento', required=True, readonly=True)
+    call_id = fields.Char(string='ID de Llamada', index=True, readonly=True)
+    payload = fields.Text(string='Datos recibidos', readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('done', 'Aplicado'),
+        ('failed', 'Fallido'),
+    ], string='Estado', default='pending', required=True, index=True, readonly=True)
+    attempts = fields.Integer(string='Intentos', readonly=True)
+    error = fields.Text(string='Error', readonly=True)
+    processed_at = fields.Datetime(string='Aplicado el', readonly=True)
+
+    # Secreto de la firma, sólo a partir de parámetros configurados (nunca una clave del código)
+    @api.model
+    def _get_webhook_secret(self):
+        params = self.env['ir.config_parameter'].sudo()
+        return params.get_param(WEBHOOK_SECRET_PARAM) or params.get_param(RETELL_API_KEY_PARAM) or None
+
+    # Comprueba la cabecera x-retell-signature ("v=<timestamp ms>,d=<hmac sha256 hex>"),
+    # calculada sobre el cuerpo crudo seguido de la marca de tiempo
+    @api.model
+    def _verify_signature(self, body, signature):
+        secret = self._get_webhook_secret()
+        if not secret:
+            return False
+        match = WEBHOOK_SIGNATURE_RE.fullmatch((signature or '').strip())
+        if not match:
+            return False
+        timestamp, digest = match.groups()
+        if abs(time.time() * 1000 - int(timestamp)) > WEBHOOK_SIGNATURE_TOLERANCE_MS:
+            return False
+        expected = hmac.new(secret.encode('utf-8'), body + timestamp.encode('utf-8'), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, digest.lower())
+
+    # Guarda el evento y despierta al cron; no hace nada más para responder rápido a Retell
+    @api.model
+    def _enqueue(self, event_type, call_data):
+        event = self.create({
+            'event_type': event_type,
+            'call_id': call_data.get('call_id'),
+            'payload': json.dumps(call_data, ensure_ascii=False),
+        })
+        self.env.ref('retain_call_history.cron_process_webhook_events').sudo()._trigger()
+        return event
+
+    # Aplica los eventos pendientes por lotes con el mismo upsert que la sincronización
+    @api.model
+    def _cron_process_events(self):
+        History = self.env['retain.call.history']
+        while True:
+            events = self.search([('state', '=', 'pending')], order='id', limit=WEBHOOK_BATCH_SIZE)
+            if not events:
+                break
+            # Para cada llamada basta con el último evento del lote (trae los datos más completos)
+            llamadas = {}
+            for event in events:
+                llamadas[event.call_id] = json.loads(event.payload)
+            try:
+                with self.env.cr.savepoint():
+                    History._sync_basic_call_data(list(llamadas.values()))
+            except Exception as e:
+                _logger.error(f"Error aplicando eventos webhook de Retell: {e}")
+                for event in events:
+                    attempts = event.attempts + 1
+                    event.write({
+                        'attempts': attempts,
+                        'error': str(e),
+                        'state': 'failed' if attempts >= WEBHOOK_MAX_ATTEMPTS else 'pending',
+                    })
+                self.env.cr.commit()
+                # Se reintentará en la siguiente ejecución del cron
+                break
+            events.write({'state': 'done', 'processed_at': fields.Datetime.now(), 'error': False})
+            self.env.cr.commit()
+        self.search([
+            ('state', '=', 'done'),
+            ('processed_at', '<', fields.Datetime.now() - timedelta(days=WEBHOOK_EVENT_RETENTION_DAYS)),
+        ]).unlink()
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+# Cliente HTTP para la API de Retell. No usa el ORM, por lo que puede
+# ejecutarse desde hilos; los resultados se aplican luego desde el cursor principal.
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+RETELL_BASE_URL = "https://api.retellai.com"
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Una sesión por hilo del worker: reutiliza conexiones TCP/TLS (keep-alive)
+_thread_local = threading.local()
+# Un circuito por URL base, compartido por todo el proceso
+_circuits = {}
+_circuits_lock = threading.Lock()
+
+
+class RetellCircuitOpenError(requests.exceptions.RequestException):
+    """Se lanza cuando el circuito está abierto tras demasiados fallos seguidos"""
+
+
+class TokenBucket:
+    """Limitador de peticiones por segundo compartido entre hilos"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(self.rate, 1.0))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Corta las peticiones durante `cooldown` segundos tras `threshold` fallos consecutivos"""
+
+    def __init__(self, threshold=5, cooldown=60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def before_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown:
+                raise RetellCircuitOpenError("Circuito abierto: demasiados errores seguidos de Retell")
+            # Semiabierto: se deja pasar una petición de prueba
+            self.opened_at = None
+            self.failures = self.threshold - 1
+
+    def record(self, success):
+        with self.lock:
+            if success:
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.failures >= self.threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                _logger.warning(f"Circuito de Retell abierto durante {self.cooldown}s tras {self.failures} fallos")
+
+
+def _get_session(pool_size):
+    session = getattr(_thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+        _thread_local.session = session
+    return session
+
+
+def _get_circuit(base_url, threshold, cooldown):
+    with _circuits_lock:
+        circuit = _circuits.get(base_url)
+        if circuit is None:
+            circuit = _circuits[base_url] = CircuitBreaker(threshold, cooldown)
+        circuit.threshold, circuit.cooldown = threshold, cooldown
+        return circuit
+
+
+# Percentil por el método del rango más cercano
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(pct / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class RetellClient:
+    """Cliente compartido por la sincronización: sesión reutilizable, timeouts,
+    reintentos con backoff, circuito de protección y métricas de las peticiones."""
+
+    def __init__(self, api_key, base_url=RETELL_BASE_URL, connect_timeout=5.0, read_timeout=30.0,
+                 max_retries=3, backoff=0.5, concurrency=8, rate_limit=10.0,
+                 circuit_threshold=5, circuit_cooldown=60):
+        self.base_url = (base_url or RETELL_BASE_URL).rstrip('/')
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+        self.circuit = _get_circuit(self.base_url, circuit_threshold, circuit_cooldown)
+        self._executor = None
+        self._stats_lock = threading.Lock()
+        self._latencies = []
+        self._errors = 0
+        self._retries = 0
+
+    def _record(self, latency, success):
+        with self._stats_lock:
+            self._latencies.append(latency)
+            if not success:
+                self._errors += 1
+
+    # Calcula la espera antes de reintentar (Retry-After o backoff exponencial)
+    def _retry_delay(self, response, attempt):
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (AttributeError, TypeError, ValueError):
+            return self.backoff * (2 ** attempt)
+
+    def request(self, method, path, **kwargs):
+        """Petición con reintentos ante 429, 5xx y errores de red. Devuelve la respuesta final."""
+        url = f"{self.base_url}{path}"
+        session = _get_session(self.concurrency)
+        attempt = 0
+        while True:
+            self.circuit.before_request()
+            if self.bucket:
+                self.bucket.acquire()
+            started = time.monotonic()
+            try:
+                response = session.request(method, url, headers=self.headers, timeout=self.timeout, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self._record(time.monotonic() - started, False)
+                self.circuit.record(False)
+                if attempt >= self.max_retries:
+                    raise
+                response, error = None, e
+            else:
+                success = response.status_code not in RETRY_STATUS_CODES
+                self._record(time.monotonic() - started, success)
+                self.circuit.record(success)
+                if success or attempt >= self.max_retries:
+                    return response
+                error = f"HTTP {response.status_code}"
+            delay = self._retry_delay(response, attempt)
+            attempt += 1
+            with self._stats_lock:
+                self._retries += 1
+            _logger.info(f"Retell: {error} en {method} {path}; reintento {attempt} en {delay:.1f}s")
+            time.sleep(delay)
+
+    def post(self, path, json=None):
+        return self.request('POST', path, json=json)
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    def fetch_call_details(self, call_ids):
+        """Descarga /v2/get-call/{call_id} en paralelo con concurrencia y tasa limitadas.
+
+        Devuelve un diccionario {call_id: detalle}; las llamadas que fallan tienen valor None.
+        """
+        def _fetch(call_id):
+            try:
+                response = self.get(f"/v2/get-call/{call_id}")
+                if response.status_code == 200:
+                    return call_id, response.json()
+                _logger.warning(f"Retell respondió {response.status_code} al pedir detalles de {call_id}")
+            except (requests.exceptions.RequestException, ValueError) as e:
+                _logger.error(f"Error obteniendo detalles para {call_id}: {e}")
+            return call_id, None
+
+        # El pool de hilos vive lo que el cliente: cada hilo conserva su sesión entre lotes
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='retell')
+        return dict(self._executor.map(_fetch, call_ids))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_stats(self):
+        """Número de peticiones, errores, reintentos y latencias (ms) desde la creación del cliente"""
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            errors, retries = self._errors, self._retries
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'retries': retries,
+            'latency_avg_ms': round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            'latency_p50_ms': round(_percentile(latencies, 50) * 1000, 1),
+            'latency_p95_ms': round(_percentile(latencies, 95) * 1000, 1),
+            'latency_p99_ms': round(_percentile(latencies, 99) * 1000, 1),
+            'latency_max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        }
@@ -63,14 +63,12 @@ patch(ListController.prototype, {
     },
 
     /**
-     * Lee agentes desde retain.call.history y deduplica por nombre.
+     * Lee la lista de agentes distintos calculada (y cacheada) en el servidor.
      * Pinta el dropdown si ya existe.
      */
     async _loadRetainAgents() {
         try {
-            const rows = await this.env.services.orm.searchRead("retain.call.history", [], ["agent_name"], { limit: 0 });
-            const uniq = [...new Set(rows.map((r) => r.agent_name).filter(Boolean))].sort();
-            this.retainAgents = uniq;
+            this.retainAgents = await this.env.services.orm.call("retain.call.history", "get_distinct_agent_names", []);
 
             this._populateAgentDropdown();
             this._updateAgentDropdownLabel();
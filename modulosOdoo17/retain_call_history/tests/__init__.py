@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+from . import test_upsert_calls
+from . import test_unlink
+from . import test_sync_state
+from . import test_fulltext
+from . import test_export
+from . import test_clean_text
+from . import test_transcript
+from . import test_sync_benchmark
+from . import test_list_search_benchmark
+from . import test_fulltext_benchmark
+from . import test_process_call_benchmark
+from . import test_clean_text_benchmark
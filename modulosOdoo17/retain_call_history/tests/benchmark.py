@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Utilidades de las pruebas de rendimiento. Las clases marcadas con BENCHMARK_TAGS no se
+# ejecutan con el resto de pruebas; se lanzan a propósito con
+#   odoo-bin -d <bd> -i retain_call_history --test-tags retain_call_benchmark
+# y se configuran con variables de entorno RETAIN_CALL_BENCHMARK_<NOMBRE>.
+import os
+import time
+
+BENCHMARK_TAGS = ('-standard', 'retain_call_benchmark', 'post_install', '-at_install')
+
+
+# Valor de RETAIN_CALL_BENCHMARK_<name> convertido al tipo del valor por defecto
+def benchmark_setting(name, default):
+    value = os.environ.get(f'RETAIN_CALL_BENCHMARK_{name}')
+    return type(default)(value) if value not in (None, '') else default
+
+
+# Lista de tamaños separados por comas (p. ej. "100000,1000000,5000000")
+def benchmark_sizes(name, default):
+    value = os.environ.get(f'RETAIN_CALL_BENCHMARK_{name}') or default
+    return [int(size) for size in str(value).split(',') if size.strip()]
+
+
+# Mejor tiempo (segundos) de `repeat` ejecuciones de func
+def best_of(func, repeat=5):
+    best = None
+    for _i in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# Inserta por SQL llamadas sintéticas numeradas de first a last (incluidos) en retain_call_history
+# (sin transcripción comprimida); `rare_word` aparece en una de cada `rare_every` descripciones
+def insert_synthetic_history(env, first, last, agents, phrases, rare_word='reembolso', rare_every=1000):
+    env['retain.call.history'].flush_model()
+    env.cr.execute("""
+        INSERT INTO retain_call_history (
+            sequence, name, phone, call_status, status_var, call_date, duration_ms, direction,
+            agent_name, call_id, description_llamada, has_transcription,
+            create_uid, create_date, write_uid, write_date
+        )
+        SELECT 'BENCH' || g, 'Sin nombre', '+346' || lpad(g::text, 8, '0'), 'ended', 'ended',
+               timestamp '2024-01-01' + g * interval '30 seconds', 1000 * (15 + g %% 600),
+               CASE WHEN g %% 2 = 0 THEN 'inbound' ELSE 'outbound' END,
+               CASE WHEN g %% 20 = 0 THEN NULL ELSE (%(agents)s::varchar[])[1 + g %% %(agent_count)s] END,
+               'bench_' || g,
+               (%(phrases)s::text[])[1 + g %% %(phrase_count)s] || ' ' ||
+               (%(phrases)s::text[])[1 + (g * 7) %% %(phrase_count)s] ||
+               CASE WHEN g %% %(rare_every)s = 0 THEN ' Solicita un ' || %(rare_word)s || '.' ELSE '' END,
+               g %% 5 <> 0,
+               %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+          FROM generate_series(%(first)s, %(last)s) AS g
+    """, {
+        'agents': list(agents), 'agent_count': len(agents),
+        'phrases': list(phrases), 'phrase_count': len(phrases),
+        'rare_word': rare_word, 'rare_every': rare_every,
+        'first': first, 'last': last, 'uid': env.uid,
+    })
+    env.cr.execute("ANALYZE retain_call_history")
+    env['retain.call.history'].invalidate_model()
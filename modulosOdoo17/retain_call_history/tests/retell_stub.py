@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# Simulador local de la API de Retell para las pruebas de carga: sirve /v2/list-calls
+# (paginado con pagination_key) y /v2/get-call/{call_id} a partir de llamadas sintéticas.
+# No usa el ORM; la sincronización lo alcanza con el parámetro retain_call_history.retell_base_url.
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ..models.llamada import DISCONNECTION_REASON_MAP
+
+# Primera llamada sintética y separación entre llamadas (ms)
+SYNTHETIC_START_TIMESTAMP = 1704067200000
+SYNTHETIC_INTERVAL_MS = 30 * 1000
+SYNTHETIC_AGENTS = tuple(f"Agente {name}" for name in (
+    'Ventas', 'Soporte', 'Cobros', 'Citas', 'Encuestas', 'Bienvenida', 'Retención', 'Reclamaciones',
+))
+SYNTHETIC_STATUSES = ('ended',) * 17 + ('not_connected', 'user_declined', 'ongoing')
+SYNTHETIC_REASONS = tuple(DISCONNECTION_REASON_MAP)
+SYNTHETIC_PHRASES = (
+    'Buenos días, le llamo de parte de la clínica para confirmar su cita.',
+    '¿Podría indicarme su número de cliente, por favor?',
+    'Sí, claro, es el que termina en cuatro siete dos.',
+    'Perfecto, veo que tiene una factura pendiente del mes de marzo.',
+    'No me llegó ningún aviso, ¿me la pueden enviar por correo?',
+    'Se la envío ahora mismo al correo que tenemos registrado.',
+    'Quería cambiar la cita del jueves a la semana que viene.',
+    'Tenemos hueco el martes a las diez o el miércoles por la tarde.',
+    'El martes me viene bien, gracias.',
+    '¿Hay algo más en lo que pueda ayudarle?',
+)
+SYNTHETIC_PHRASE_WORDS = tuple(tuple(phrase.split()) for phrase in SYNTHETIC_PHRASES)
+GET_CALL_RE = re.compile(r'^/v2/get-call/([^/?]+)$')
+
+
+class SyntheticCallGenerator:
+    """Genera llamadas de Retell deterministas a partir de su índice (no guarda nada en memoria).
+
+    - turns / large_turns: turnos de la transcripción normal y de las grandes
+    - large_ratio: proporción de llamadas con transcripción grande
+    - missing_agent_ratio: proporción de llamadas sin agente en ningún endpoint
+    - list_detail_ratio: proporción de llamadas que traen transcripción y agente ya en
+      /v2/list-calls; el resto sólo los trae /v2/get-call (el enriquecimiento los completa)
+    """
+
+    def __init__(self, count, seed=0, turns=20, large_turns=300, large_ratio=0.05,
+                 missing_agent_ratio=0.05, list_detail_ratio=0.7):
+        self.count = count
+        self.seed = seed
+        self.turns = turns
+        self.large_turns = large_turns
+        self.large_ratio = large_ratio
+        self.missing_agent_ratio = missing_agent_ratio
+        self.list_detail_ratio = list_detail_ratio
+
+    def call_id(self, index):
+        return f"call_{self.seed:04d}_{index:09d}"
+
+    def index_of(self, call_id):
+        match = re.fullmatch(rf"call_{self.seed:04d}_(\d+)", call_id or '')
+        return int(match.group(1)) if match else None
+
+    def start_timestamp(self, index):
+        return SYNTHETIC_START_TIMESTAMP + index * SYNTHETIC_INTERVAL_MS
+
+    # Índice de la primera llamada con start_timestamp >= lower_threshold
+    def first_index_from(self, lower_threshold):
+        if not lower_threshold:
+            return 0
+        return max(-(-(lower_threshold - SYNTHETIC_START_TIMESTAMP) // SYNTHETIC_INTERVAL_MS), 0)
+
+    def _transcript_object(self, rng, turns):
+        utterances, clock = [], 0.0
+        for turn in range(turns):
+            phrases = rng.choices(SYNTHETIC_PHRASE_WORDS, k=rng.randint(1, 3))
+            words = [word for phrase in phrases for word in phrase]
+            utterances.append({
+                'role': 'agent' if turn % 2 == 0 else 'user',
+                'content': ' '.join(words),
+                'words': [
+                    {'word': word, 'start': round(clock + i * 0.35, 2), 'end': round(clock + i * 0.35 + 0.3, 2)}
+                    for i, word in enumerate(words)
+                ],
+            })
+            clock += len(words) * 0.35 + 0.8
+        return utterances
+
+    # Payload completo de /v2/get-call; con full=False, el recortado de /v2/list-calls
+    def call(self, index, full=True):
+        rng = random.Random(self.seed * 1000003 + index)
+        start = self.start_timestamp(index)
+        large = rng.random() < self.large_ratio
+        has_agent = rng.random() >= self.missing_agent_ratio
+        in_list = rng.random() < self.list_detail_ratio
+        status = rng.choice(SYNTHETIC_STATUSES)
+        duration_ms = rng.randint(15, 900) * 1000 if status == 'ended' else 0
+        call = {
+            'call_id': self.call_id(index),
+            'call_type': 'phone_call',
+            'agent_id': f"agent_{rng.randrange(len(SYNTHETIC_AGENTS)):02d}",
+            'call_status': status,
+            'start_timestamp': start,
+            'end_timestamp': start + duration_ms,
+            'duration_ms': duration_ms,
+            'direction': rng.choice(('inbound', 'outbound')),
+            'from_number': f"+3491{rng.randrange(10 ** 7):07d}",
+            'to_number': f"+346{rng.randrange(10 ** 8):08d}",
+            'disconnection_reason': rng.choice(SYNTHETIC_REASONS) if status == 'ended' else '',
+            'metadata': {},
+            'call_analysis': {
+                'call_summary': ' '.join(rng.choice(SYNTHETIC_PHRASES) for _i in range(3)),
+                'user_sentiment': rng.choice(('Positive', 'Neutral', 'Negative')),
+                'call_successful': rng.random() < 0.8,
+            },
+        }
+        # _search_agent_name_in_data también acepta agent_id: sin agente no debe quedar ninguno
+        if has_agent:
+            call['agent_name'] = SYNTHETIC_AGENTS[int(call['agent_id'][-2:])]
+        else:
+            call.pop('agent_id')
+        if not full and not in_list:
+            call.pop('agent_name', None)
+            call.pop('agent_id', None)
+            return call
+        if status == 'ended':
+            transcript_object = self._transcript_object(rng, self.large_turns if large else self.turns)
+            call['transcript_object'] = transcript_object
+            call['transcript'] = '\n'.join(
+                f"{'Agent' if u['role'] == 'agent' else 'User'}: {u['content']}" for u in transcript_object
+            )
+        return call
+
+
+class RetellStubServer:
+    """Servidor HTTP local con la forma de la API v2 de Retell y fallos inyectados.
+
+    - latency_ms: espera añadida a cada respuesta
+    - rate_limit_ratio / error_ratio: proporción de peticiones que responden 429 (con
+      Retry-After) o 500 en su primer intento; el reintento de la misma petición responde bien
+    - missing_detail_ratio: proporción de /v2/get-call que responden 404 siempre
+    """
+
+    def __init__(self, generator, latency_ms=0, rate_limit_ratio=0.0, error_ratio=0.0,
+                 missing_detail_ratio=0.0, retry_after=0, seed=0):
+        self.generator = generator
+        self.latency_ms = latency_ms
+        self.rate_limit_ratio = rate_limit_ratio
+        self.error_ratio = error_ratio
+        self.missing_detail_ratio = missing_detail_ratio
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.failed_once = set()
+        self.stats = dict.fromkeys(('list_calls', 'get_call', 'rate_limited', 'errors', 'not_found'), 0)
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                stub._handle(self, 'POST', self.path, body)
+
+            def do_GET(self):
+                stub._handle(self, 'GET', self.path, b'')
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='retell-stub', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.thread.join()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    # Decide si la petición falla en este intento (sólo en el primero de cada petición)
+    def _injected_fault(self, request_key):
+        with self.lock:
+            if request_key in self.failed_once:
+                return None
+            draw = self.rng.random()
+            if draw < self.rate_limit_ratio:
+                fault = 429
+            elif draw < self.rate_limit_ratio + self.error_ratio:
+                fault = 500
+            else:
+                return None
+            self.failed_once.add(request_key)
+            return fault
+
+    def _send(self, handler, status, payload=None, headers=()):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _handle(self, handler, method, path, body):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        if not (handler.headers.get('Authorization') or '').startswith('Bearer '):
+            return self._send(handler, 401, {'error_message': 'Falta la API key'})
+        match = GET_CALL_RE.match(path)
+        if method == 'POST' and path == '/v2/list-calls':
+            request_key = ('list', body)
+        elif method == 'GET' and match:
+            request_key = ('get', match.group(1))
+        else:
+            return self._send(handler, 404, {'error_message': 'Ruta no encontrada'})
+        fault = self._injected_fault(request_key)
+        if fault == 429:
+            self._count('rate_limited')
+            return self._send(handler, 429, {'error_message': 'Too many requests'},
+                              headers=[('Retry-After', str(self.retry_after))])
+        if fault == 500:
+            self._count('errors')
+            return self._send(handler, 500, {'error_message': 'Internal error'})
+        if request_key[0] == 'list':
+            self._count('list_calls')
+            return self._send(handler, 200, self._list_calls(json.loads(body or b'{}')))
+        self._count('get_call')
+        index = self.generator.index_of(match.group(1))
+        missing = random.Random(f"{self.generator.seed}:{index}").random() < self.missing_detail_ratio
+        if index is None or index >= self.generator.count or missing:
+            self._count('not_found')
+            return self._send(handler, 404, {'error_message': 'Llamada no encontrada'})
+        return self._send(handler, 200, self.generator.call(index, full=True))
+
+    # /v2/list-calls en orden ascendente de start_timestamp, paginado por el último call_id
+    def _list_calls(self, payload):
+        generator = self.generator
+        limit = int(payload.get('limit') or 1000)
+        lower_threshold = ((payload.get('filter_criteria') or {}).get('start_timestamp') or {}).get('lower_threshold')
+        start = generator.first_index_from(lower_threshold)
+        last_index = generator.index_of(payload.get('pagination_key'))
+        if last_index is not None:
+            start = max(start, last_index + 1)
+        return [generator.call(index, full=False) for index in range(start, min(start + limit, generator.count))]
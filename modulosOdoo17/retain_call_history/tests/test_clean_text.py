@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+import re
+
+from odoo.tests.common import TransactionCase, tagged
+
+
+# Copia congelada de _clean_text_formatting antes de saltar los pasos innecesarios: la
+# versión actual debe dar exactamente el mismo resultado para cualquier texto
+def clean_text_formatting_reference(text):
+    if not text:
+        return ""
+    if isinstance(text, (dict, list)):
+        text = json.dumps(text, indent=2, ensure_ascii=False)
+    text = str(text)
+    text = text.replace('\\n', '\n')
+    text = text.replace('\\r\\n', '\n')
+    text = text.replace('\\r', '\n')
+    text = text.replace('\\t', '    ')
+    text = text.replace('\\"', '"')
+    text = text.replace('\\/', '/')
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = '\n'.join([line.rstrip() for line in text.split('\n')])
+    return text.strip()
+
+
+# Piezas con las que se construyen los textos aleatorios: escapes literales, saltos de
+# línea, espacios (también Unicode) y texto normal
+RANDOM_PIECES = (
+    '\\n', '\\r', '\\r\\n', '\\t', '\\"', '\\/', '\\', '\\\\n', 'n', 'r', 't', '"', '/',
+    '\n', '\r', '\r\n', '\n\n\n', ' ', '\t', '\x0b', '\x0c', '\x1c', '\x85', '\xa0', ' ', '　',
+    'Agente:', 'Usuario:', 'Hola, ¿en qué puedo ayudarle?', 'ñandú', '😀',
+)
+RANDOM_CASES = 5000
+
+
+@tagged('post_install', '-at_install')
+class TestCleanTextFormatting(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Llamada = cls.env['retain.call.history']
+
+    def assertSameAsReference(self, text):
+        self.assertEqual(
+            self.Llamada._clean_text_formatting(text), clean_text_formatting_reference(text), repr(text)
+        )
+
+    # Textos como los que llegan de Retell
+    def test_realistic_inputs(self):
+        for text in (
+            None, '', False, 0, 123, ['linea 1', 'linea 2'], {'role': 'agent', 'content': 'Hola'},
+            'Agente: Hola\\nUsuario: Buenas\\n\\n\\n\\nAgente: ¿En qué le ayudo?',
+            'Agent: Hi   \nUser: Hello\t\n\n\n\nAgent: Bye  ',
+            'Resumen:\\r\\nEl cliente pidió la factura\\r\\n\\tImporte: 20\\/04',
+            'Dijo \\"hola\\" y colgó',
+            'Texto ya normalizado\n\nsin nada que cambiar',
+            '  \n\n  espacios alrededor \n\n ',
+        ):
+            self.assertSameAsReference(text)
+
+    # Textos aleatorios con todas las combinaciones de escapes, saltos y espacios
+    def test_randomized_inputs(self):
+        rng = random.Random(1234)
+        for _i in range(RANDOM_CASES):
+            self.assertSameAsReference(''.join(rng.choices(RANDOM_PIECES, k=rng.randint(0, 40))))
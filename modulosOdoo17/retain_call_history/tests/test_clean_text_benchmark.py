@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo.tests.common import TransactionCase, tagged
+
+from .benchmark import BENCHMARK_TAGS, benchmark_setting, best_of
+from .retell_stub import SyntheticCallGenerator
+from .test_clean_text import clean_text_formatting_reference
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged(*BENCHMARK_TAGS)
+class TestCleanTextBenchmark(TransactionCase):
+    """Coste de _clean_text_formatting frente a la copia congelada anterior, sobre
+    RETAIN_CALL_BENCHMARK_CLEAN_TEXT_CALLS transcripciones grandes (por defecto 200), tanto
+    limpias como con los saltos y comillas escapados tal como llegan a veces de Retell."""
+
+    def test_clean_text_formatting_cost(self):
+        Llamada = self.env['retain.call.history']
+        count = benchmark_setting('CLEAN_TEXT_CALLS', 200)
+        repeat = benchmark_setting('REPEAT', 5)
+        generator = SyntheticCallGenerator(count, seed=15, large_turns=300, large_ratio=1.0, list_detail_ratio=1.0)
+        # Sólo las llamadas terminadas traen transcripción
+        calls = (generator.call(index) for index in range(count))
+        clean = [call['transcript'] for call in calls if call.get('transcript')]
+        escaped = [text.replace('"', '\\"').replace('\n', '\\n') for text in clean]
+
+        for name, texts in (('limpias', clean), ('escapadas', escaped)):
+            # Mismo resultado, byte a byte, que la versión anterior
+            for text in texts:
+                self.assertEqual(
+                    Llamada._clean_text_formatting(text).encode('utf-8'),
+                    clean_text_formatting_reference(text).encode('utf-8'),
+                )
+            size_mb = sum(len(text) for text in texts) / (1024.0 * 1024.0)
+            reference = best_of(lambda: [clean_text_formatting_reference(text) for text in texts], repeat)
+            current = best_of(lambda: [Llamada._clean_text_formatting(text) for text in texts], repeat)
+            _logger.info(
+                f"Benchmark _clean_text_formatting con {len(texts)} transcripciones {name} ({size_mb:.1f} MB): "
+                f"{reference * 1000:.1f} ms antes, {current * 1000:.1f} ms ahora "
+                f"({reference / current:.1f}x)"
+            )
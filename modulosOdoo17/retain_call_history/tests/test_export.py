@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestExport(TransactionCase):
+
+    # Cambiar los filtros de una exportación terminada descarta el fichero generado
+    def test_changing_filters_discards_file(self):
+        attachment = self.env['ir.attachment'].create({'name': 'llamadas.csv', 'raw': b'sequence\n'})
+        export = self.env['retain.call.export'].create({'export_format': 'csv'})
+        export.write({'state': 'done', 'attachment_id': attachment.id, 'row_count': 1})
+
+        export.write({'date_from': '2024-01-01 00:00:00'})
+        self.assertFalse(export.attachment_id)
+        self.assertEqual(export.row_count, 0)
+        self.assertEqual(export.state, 'draft')
+        self.assertFalse(attachment.exists())
+        self.assertEqual(export.action_download()['url'], f"/retain_call_history/export/{export.id}")
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestFulltext(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Llamada = cls.env['retain.call.history']
+        cls.por_resumen = cls.Llamada.create({
+            'call_id': 'call_fts_resumen',
+            'phone': '+34600000010',
+            'description_llamada': 'El cliente pidió la factura de marzo',
+        })
+        cls.por_transcripcion = cls.Llamada.create({
+            'call_id': 'call_fts_transcripcion',
+            'phone': '+34600000011',
+            'transcription': 'Agente: ¿Necesita la factura del mes pasado?',
+        })
+        cls.sin_coincidencia = cls.Llamada.create({
+            'call_id': 'call_fts_otra',
+            'phone': '+34600000012',
+            'description_llamada': 'Consulta sobre horarios',
+            'transcription': 'Agente: Abrimos a las nueve',
+        })
+
+    # Los dominios de búsqueda se resuelven con una subconsulta, no con una lista de ids
+    def test_search_domains_use_subquery(self):
+        domain = self.Llamada._search_fulltext('ilike', 'factura')
+        self.assertNotIsInstance(domain[0][2], (list, tuple))
+        self.assertEqual(self.Llamada.search(domain), self.por_resumen | self.por_transcripcion)
+
+        domain = self.Llamada._search_transcription('ilike', 'factura')
+        self.assertEqual(self.Llamada.search(domain), self.por_transcripcion)
+
+    def test_search_from_fields(self):
+        llamadas = self.Llamada.search([('fulltext', 'ilike', 'factura'), ('call_id', 'like', 'call_fts_')])
+        self.assertEqual(llamadas, self.por_resumen | self.por_transcripcion)
+        llamadas = self.Llamada.search([('transcription', 'ilike', 'nueve')])
+        self.assertEqual(llamadas, self.sin_coincidencia)
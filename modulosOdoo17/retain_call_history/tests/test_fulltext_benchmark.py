@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo.tests.common import TransactionCase, tagged
+
+from .benchmark import BENCHMARK_TAGS, benchmark_setting, best_of, insert_synthetic_history
+from .retell_stub import SYNTHETIC_AGENTS, SYNTHETIC_PHRASES
+
+_logger = logging.getLogger(__name__)
+
+# Palabra frecuente (en una de las frases sintéticas) y palabra rara (1 de cada 1000 llamadas)
+FULLTEXT_BENCHMARK_QUERIES = ('factura', 'reembolso')
+
+
+@tagged(*BENCHMARK_TAGS)
+class TestFulltextBenchmark(TransactionCase):
+    """Búsqueda de texto completo (índice GIN) frente al ILIKE anterior sobre el resumen de
+    la llamada, con RETAIN_CALL_BENCHMARK_FTS_ROWS llamadas (por defecto 200000)."""
+
+    def test_fulltext_vs_ilike(self):
+        Llamada = self.env['retain.call.history']
+        rows = benchmark_setting('FTS_ROWS', 200000)
+        repeat = benchmark_setting('REPEAT', 5)
+        insert_synthetic_history(self.env, 1, rows, SYNTHETIC_AGENTS, SYNTHETIC_PHRASES)
+
+        for query in FULLTEXT_BENCHMARK_QUERIES:
+            ilike_domain = [('description_llamada', 'ilike', query)]
+            fulltext_domain = [('fulltext', 'ilike', query)]
+
+            def search(domain):
+                # Lo que pide la vista lista: primera página y total
+                Llamada.search(domain, limit=80)
+                Llamada.search_count(domain)
+                self.env.invalidate_all()
+
+            ilike = best_of(lambda: search(ilike_domain), repeat)
+            fulltext = best_of(lambda: search(fulltext_domain), repeat)
+            ranked = best_of(lambda: Llamada.fulltext_search(query), repeat)
+            # Los dos caminos encuentran las mismas llamadas
+            self.assertEqual(Llamada.search_count(fulltext_domain), Llamada.search_count(ilike_domain))
+            _logger.info(
+                f"Benchmark texto completo '{query}' con {rows} llamadas: ILIKE {ilike * 1000:.1f} ms, "
+                f"índice GIN {fulltext * 1000:.1f} ms, fulltext_search con ranking {ranked * 1000:.1f} ms"
+            )
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import logging
+from datetime import datetime
+
+from odoo.tests.common import TransactionCase, tagged
+
+from .benchmark import BENCHMARK_TAGS, benchmark_setting, benchmark_sizes, best_of, insert_synthetic_history
+from .retell_stub import SYNTHETIC_AGENTS, SYNTHETIC_PHRASES
+
+_logger = logging.getLogger(__name__)
+
+# Índices de user-009 que se quitan para medir el "antes"
+LIST_INDEXES = (
+    'retain_call_history_agent_date_index',
+    'retain_call_history_no_transcription_index',
+    'retain_call_history_missing_agent_index',
+)
+
+
+@tagged(*BENCHMARK_TAGS)
+class TestListSearchBenchmark(TransactionCase):
+    """Latencia de las búsquedas de la vista lista (agentes + rango de fechas, como la barra
+    de filtros) y de la búsqueda de datos incompletos de la sincronización, con y sin los
+    índices, para cada tamaño de RETAIN_CALL_BENCHMARK_LIST_ROWS (por defecto 100000;
+    p. ej. "100000,1000000,5000000")."""
+
+    def _measure(self, repeat):
+        Llamada = self.env['retain.call.history']
+        list_domain = [
+            ('agent_name', 'in', list(SYNTHETIC_AGENTS[:2])),
+            ('call_date', '>=', datetime(2024, 1, 2)),
+            ('call_date', '<=', datetime(2024, 1, 9)),
+        ]
+        missing_domain = [
+            '|', ('has_transcription', '=', False), ('agent_name', '=', False),
+            ('enrichment_attempted_at', '=', False),
+        ]
+
+        def list_search():
+            # Lo que pide la vista lista: primera página y total
+            Llamada.search(list_domain, limit=80)
+            Llamada.search_count(list_domain)
+            self.env.invalidate_all()
+
+        def missing_search():
+            Llamada.search(missing_domain, limit=200)
+            self.env.invalidate_all()
+
+        return best_of(list_search, repeat), best_of(missing_search, repeat)
+
+    def test_list_search_latency(self):
+        repeat = benchmark_setting('REPEAT', 5)
+        inserted = 0
+        for rows in sorted(benchmark_sizes('LIST_ROWS', '100000')):
+            insert_synthetic_history(self.env, inserted + 1, rows, SYNTHETIC_AGENTS, SYNTHETIC_PHRASES)
+            inserted = rows
+            with_indexes = self._measure(repeat)
+            # El DROP INDEX se deshace con el savepoint
+            with self.env.cr.savepoint(flush=False) as savepoint:
+                for index in LIST_INDEXES:
+                    self.env.cr.execute(f'DROP INDEX IF EXISTS "{index}"')
+                self.env.cr.execute("ANALYZE retain_call_history")
+                without_indexes = self._measure(repeat)
+                savepoint.rollback()
+            _logger.info(
+                f"Benchmark búsqueda en lista con {rows} llamadas: filtros de la barra "
+                f"{without_indexes[0] * 1000:.1f} ms sin índices / {with_indexes[0] * 1000:.1f} ms con índices; "
+                f"datos incompletos {without_indexes[1] * 1000:.1f} ms / {with_indexes[1] * 1000:.1f} ms"
+            )
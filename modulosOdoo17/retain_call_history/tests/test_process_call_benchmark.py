@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+from datetime import datetime
+
+from odoo.tests.common import TransactionCase, tagged
+
+from ..models.llamada import DISCONNECTION_REASON_MAP
+from .benchmark import BENCHMARK_TAGS, benchmark_setting, best_of
+from .retell_stub import SyntheticCallGenerator
+
+_logger = logging.getLogger(__name__)
+
+
+# Copia congelada del mapeo anterior a user-025 (búsqueda del agente y lista de estados
+# rehechas en cada llamada), para comparar resultado y coste
+def search_agent_name_reference(data_dict, analysis_dict=None):
+    agent_fields = [
+        'agent_name', 'agent', 'assistant_name', 'assistant',
+        'agent_id', 'assistant_id', 'bot_name', 'bot_id',
+        'voice_agent', 'ai_agent', 'virtual_agent'
+    ]
+    for field in agent_fields:
+        if data_dict.get(field):
+            return data_dict.get(field)
+    if analysis_dict:
+        for field in agent_fields:
+            if analysis_dict.get(field):
+                return analysis_dict.get(field)
+    for key, value in data_dict.items():
+        if isinstance(value, dict):
+            for field in agent_fields:
+                if value.get(field):
+                    return value.get(field)
+    return ""
+
+
+def process_call_data_reference(model, llamada_data):
+    call_id = llamada_data.get("call_id")
+    if not call_id:
+        return None
+    phone = llamada_data.get("to_number") or llamada_data.get("from_number") or ""
+    status_raw = llamada_data.get("call_status", "unknown")
+    status = status_raw if status_raw in dict(model._fields['call_status'].selection) else 'unknown'
+    start_ts = llamada_data.get("start_timestamp")
+    duration_ms = llamada_data.get("duration_ms", 0)
+    call_date = datetime.utcfromtimestamp(start_ts / 1000.0) if start_ts else False
+    duration_min = round(duration_ms / 60000.0, 2)
+    analysis = llamada_data.get("call_analysis", {})
+    transcription = model._search_transcription_in_data(llamada_data, analysis)
+    if transcription:
+        if isinstance(transcription, list):
+            transcription = '\n'.join(map(str, transcription))
+        elif isinstance(transcription, dict):
+            transcription = json.dumps(transcription, indent=2, ensure_ascii=False)
+    agent_name = search_agent_name_reference(llamada_data, analysis)
+    disconnection_reason = llamada_data.get("disconnection_reason", "")
+    turns = model._extract_transcript_turns(llamada_data)
+    vals = {
+        'call_id': call_id,
+        'name': 'Sin nombre',
+        'phone': phone,
+        'call_status': status,
+        'call_date': call_date,
+        'duration': duration_min,
+        'duration_ms': duration_ms,
+        'direction': llamada_data.get("direction", ""),
+        'from_number': llamada_data.get("from_number", ""),
+        'to_number': llamada_data.get("to_number", ""),
+        'agent_name': agent_name,
+        'disconnection_reason': DISCONNECTION_REASON_MAP.get(disconnection_reason, disconnection_reason),
+        'description_llamada': analysis.get("call_summary", ""),
+        'transcription': transcription,
+    }
+    if turns:
+        vals['transcript_turns'] = turns
+    return vals
+
+
+@tagged(*BENCHMARK_TAGS)
+class TestProcessCallBenchmark(TransactionCase):
+    """Coste por llamada de _process_call_data con el mapeo compilado frente a la copia
+    anterior, sobre RETAIN_CALL_BENCHMARK_PROCESS_CALLS payloads sintéticos (por defecto 5000)."""
+
+    def test_process_call_data_cost(self):
+        Llamada = self.env['retain.call.history']
+        count = benchmark_setting('PROCESS_CALLS', 5000)
+        repeat = benchmark_setting('REPEAT', 5)
+        generator = SyntheticCallGenerator(count, seed=25, turns=5, large_ratio=0.0)
+        payloads = [generator.call(index, full=index % 2 == 0) for index in range(count)]
+
+        # Mismo resultado que el mapeo anterior
+        for payload in payloads:
+            self.assertEqual(Llamada._process_call_data(payload), process_call_data_reference(Llamada, payload))
+
+        reference = best_of(lambda: [process_call_data_reference(Llamada, payload) for payload in payloads], repeat)
+        compiled = best_of(lambda: [Llamada._process_call_data(payload) for payload in payloads], repeat)
+        agent_reference = best_of(lambda: [
+            search_agent_name_reference(payload, payload.get('call_analysis')) for payload in payloads
+        ], repeat)
+        agent = best_of(lambda: [
+            Llamada._search_agent_name_in_data(payload, payload.get('call_analysis')) for payload in payloads
+        ], repeat)
+        _logger.info(
+            f"Benchmark _process_call_data con {count} llamadas: {reference / count * 1e6:.1f} µs/llamada antes, "
+            f"{compiled / count * 1e6:.1f} µs/llamada con el mapeo compilado; búsqueda del agente "
+            f"{agent_reference / count * 1e6:.2f} µs -> {agent / count * 1e6:.2f} µs"
+        )
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+from odoo import fields
+from odoo.tests.common import TransactionCase, tagged
+
+from ..models.llamada import (
+    DETAIL_CONCURRENCY_PARAM, DETAIL_RATE_LIMIT_PARAM, RETELL_API_KEY_PARAM, RETELL_BASE_URL_PARAM,
+    RETELL_CIRCUIT_THRESHOLD_PARAM, RETELL_MAX_RETRIES_PARAM, SYNC_STAGES,
+)
+from .benchmark import BENCHMARK_TAGS, benchmark_setting
+from .retell_stub import RetellStubServer, SyntheticCallGenerator
+
+_logger = logging.getLogger(__name__)
+
+BENCHMARK_SEED = 24
+
+
+@tagged(*BENCHMARK_TAGS)
+class TestSyncBenchmark(TransactionCase):
+    """Sincronización completa contra el simulador local de Retell: throughput de extremo
+    a extremo, pico de memoria y tiempo y consultas SQL por etapa (retain.call.sync.job).
+
+    Variables de entorno: CALLS, LATENCY_MS, RATE_LIMIT_RATIO, ERROR_RATIO,
+    MISSING_DETAIL_RATIO, LARGE_RATIO, MISSING_AGENT_RATIO y CONCURRENCY."""
+
+    def setUp(self):
+        super().setUp()
+        self.generator = SyntheticCallGenerator(
+            benchmark_setting('CALLS', 2000),
+            seed=BENCHMARK_SEED,
+            large_ratio=benchmark_setting('LARGE_RATIO', 0.05),
+            missing_agent_ratio=benchmark_setting('MISSING_AGENT_RATIO', 0.05),
+        )
+        self.stub = RetellStubServer(
+            self.generator,
+            latency_ms=benchmark_setting('LATENCY_MS', 5),
+            rate_limit_ratio=benchmark_setting('RATE_LIMIT_RATIO', 0.02),
+            error_ratio=benchmark_setting('ERROR_RATIO', 0.02),
+            missing_detail_ratio=benchmark_setting('MISSING_DETAIL_RATIO', 0.01),
+            seed=BENCHMARK_SEED,
+        ).start()
+        self.addCleanup(self.stub.stop)
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param(RETELL_BASE_URL_PARAM, self.stub.base_url)
+        params.set_param(RETELL_API_KEY_PARAM, 'key_benchmark')
+        params.set_param(DETAIL_CONCURRENCY_PARAM, benchmark_setting('CONCURRENCY', 8))
+        # Sin límite de peticiones por segundo y con margen para los fallos inyectados
+        params.set_param(DETAIL_RATE_LIMIT_PARAM, 0)
+        params.set_param(RETELL_MAX_RETRIES_PARAM, 5)
+        params.set_param(RETELL_CIRCUIT_THRESHOLD_PARAM, 1000)
+        # Los commits parciales de la sincronización no pueden confirmar la transacción de la prueba
+        self.patch(self.env.cr, 'commit', self.env.cr.flush)
+
+    def _run_sync(self, full):
+        job = self.env['retain.call.sync.job'].create({
+            'full': full, 'state': 'running', 'date_start': fields.Datetime.now(),
+        })
+        started = time.perf_counter()
+        self.env['retain.call.history']._sincronizar_historial(full=full, job=job)
+        elapsed = time.perf_counter() - started
+        self._report('completa' if full else 'incremental', job, elapsed)
+        return job
+
+    def _report(self, label, job, elapsed):
+        stages = ", ".join(
+            f"{stage} {job[f'duration_{stage}']:.2f}s/{job[f'sql_queries_{stage}']} consultas"
+            for stage in SYNC_STAGES
+        )
+        _logger.info(
+            f"Benchmark sincronización {label}: {job.calls_fetched} llamadas en {elapsed:.2f}s "
+            f"({job.calls_fetched / elapsed if elapsed else 0:.1f} llamadas/s), pico de memoria "
+            f"{job.peak_memory_mb:.1f} MB | {stages} | Retell: {job.api_requests} peticiones, "
+            f"{job.api_retries} reintentos, p95 {job.api_latency_p95_ms:.1f} ms | simulador: {self.stub.stats}"
+        )
+
+    def test_sync_throughput(self):
+        count = self.generator.count
+        job = self._run_sync(full=True)
+        self.assertEqual(job.calls_fetched, count)
+        self.assertEqual(job.calls_created, count)
+        self.assertEqual(
+            self.env['retain.call.history'].search_count([('call_id', '=like', f'call_{BENCHMARK_SEED:04d}_%')]),
+            count,
+        )
+        self.assertGreater(job.details_fetched, 0)
+
+        # Sin cambios en Retell: la ventana de solapamiento se vuelve a pedir y se omite
+        job = self._run_sync(full=False)
+        self.assertEqual(job.calls_created, 0)
+        self.assertEqual(job.calls_updated, 0)
+        self.assertEqual(job.calls_skipped, job.calls_fetched)
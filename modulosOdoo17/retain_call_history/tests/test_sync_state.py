@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo.tests.common import TransactionCase, tagged
+
+from ..models.llamada_daily_stats import DAILY_STATS_SAFETY_MARGIN
+
+
+@tagged('post_install', '-at_install')
+class TestSyncState(TransactionCase):
+
+    # La marca de agua sólo avanza y el punto de reanudación se guarda y se borra,
+    # sin escribir en ir.config_parameter (que vaciaría la caché del registro)
+    def test_state_does_not_touch_config_parameters(self):
+        Llamada = self.env['retain.call.history']
+        params_before = self.env['ir.config_parameter'].search_count([])
+        Llamada._set_sync_last_timestamp(1700000000000)
+        Llamada._set_sync_last_timestamp(1600000000000)
+        self.assertEqual(self.env['retain.call.sync.state']._get_state().last_start_timestamp, 1700000000000)
+
+        checkpoint = {'full': False, 'lower_threshold': None, 'cursor': 'abc', 'cursor_key': 'cursor'}
+        Llamada._set_sync_checkpoint(checkpoint)
+        self.assertEqual(Llamada._get_sync_checkpoint(full=False), checkpoint)
+        self.assertIsNone(Llamada._get_sync_checkpoint(full=True))
+        Llamada._set_sync_checkpoint(None)
+        self.assertIsNone(Llamada._get_sync_checkpoint(full=False))
+        self.assertEqual(self.env['ir.config_parameter'].search_count([]), params_before)
+
+    # El refresco del resumen diario guarda su marca en el estado, con el margen de seguridad
+    def test_daily_stats_mark_in_state(self):
+        params_before = self.env['ir.config_parameter'].search_count([])
+        self.env['retain.call.daily.stats']._refresh_changed()
+        self.env.cr.execute("SELECT clock_timestamp() at time zone 'UTC'")
+        now = self.env.cr.fetchone()[0]
+        refreshed_at = self.env['retain.call.sync.state']._get_state().daily_stats_refreshed_at
+        self.assertTrue(refreshed_at)
+        self.assertLess(refreshed_at, now - DAILY_STATS_SAFETY_MARGIN + timedelta(minutes=1))
+        self.assertEqual(self.env['ir.config_parameter'].search_count([]), params_before)
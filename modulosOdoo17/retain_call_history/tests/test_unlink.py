@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestUnlink(TransactionCase):
+
+    # call_date es opcional: una llamada sin fecha también se puede borrar
+    def test_unlink_call_without_date(self):
+        Llamada = self.env['retain.call.history']
+        llamadas = Llamada.create([
+            {'call_id': 'call_unlink_sin_fecha', 'phone': '+34600000001'},
+            {'call_id': 'call_unlink_con_fecha', 'phone': '+34600000002', 'call_date': '2024-05-01 10:00:00'},
+        ])
+        llamadas.unlink()
+        self.assertFalse(llamadas.exists())
+        self.assertEqual(
+            self.env['retain.call.history.trash'].search_count([('call_id', 'like', 'call_unlink_')]), 2
+        )
+
+    # El agente sólo desaparece de la lista de filtros al borrar su última llamada
+    def test_unlink_last_call_of_agent(self):
+        Llamada = self.env['retain.call.history']
+        primera, segunda = Llamada.create([
+            {'call_id': f'call_unlink_agente_{i}', 'phone': '+34600000003', 'agent_name': 'Agente Unlink'}
+            for i in range(2)
+        ])
+        self.assertIn('Agente Unlink', Llamada.get_distinct_agent_names())
+        primera.unlink()
+        self.assertIn('Agente Unlink', Llamada.get_distinct_agent_names())
+        segunda.unlink()
+        self.assertNotIn('Agente Unlink', Llamada.get_distinct_agent_names())
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from odoo.tests.common import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestUpsertCalls(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Llamada = cls.env['retain.call.history']
+
+    def _payload(self, call_id, contents, **extra):
+        payload = {
+            'call_id': call_id,
+            'call_status': 'ended',
+            'start_timestamp': 1700000000000,
+            'duration_ms': 60000,
+            'direction': 'inbound',
+            'from_number': '+34600000000',
+            'to_number': '+34900000000',
+            'transcript_object': [
+                {'role': role, 'content': content, 'words': []}
+                for role, content in contents
+            ],
+        }
+        payload.update(extra)
+        return payload
+
+    # Una llamada que ya existe y cuyos turnos cambian se actualiza (transcript_turns es una lista)
+    def test_update_call_with_changed_turns(self):
+        vals = self.Llamada._process_call_data(self._payload('call_turns_1', [('agent', 'Hola')]))
+        self.assertEqual(self.Llamada._upsert_calls([vals]), (1, 0))
+        llamada = self.Llamada.search([('call_id', '=', 'call_turns_1')])
+
+        vals = self.Llamada._process_call_data(self._payload('call_turns_1', [
+            ('agent', 'Hola'), ('user', '¿Qué tal?'),
+        ]))
+        self.assertEqual(self.Llamada._upsert_calls([vals]), (0, 1))
+        self.assertEqual([turn['text'] for turn in llamada.transcript_turns], ['Hola', '¿Qué tal?'])
+
+    # Llamadas con los mismos cambios se escriben juntas y las distintas por separado
+    def test_group_equal_changes(self):
+        payloads = [self._payload(f'call_group_{i}', [('agent', 'Hola')]) for i in range(3)]
+        self.Llamada._upsert_calls([self.Llamada._process_call_data(payload) for payload in payloads])
+
+        payloads[0]['transcript_object'].append({'role': 'user', 'content': 'Adiós', 'words': []})
+        payloads[1]['transcript_object'].append({'role': 'user', 'content': 'Adiós', 'words': []})
+        payloads[2]['direction'] = 'outbound'
+        creadas, modificadas = self.Llamada._upsert_calls(
+            [self.Llamada._process_call_data(payload) for payload in payloads]
+        )
+        self.assertEqual((creadas, modificadas), (0, 3))
+        llamadas = self.Llamada.search([('call_id', 'like', 'call_group_')], order='call_id')
+        self.assertEqual([len(llamada.transcript_turns) for llamada in llamadas], [2, 2, 1])
+        self.assertEqual(llamadas.mapped('direction'), ['inbound', 'inbound', 'outbound'])
+
+    # Un payload de /v2/list-calls sin transcripción ni agente no borra lo ya enriquecido
+    def test_list_payload_keeps_enriched_data(self):
+        payload = self._payload('call_enriched_1', [('agent', 'Hola'), ('user', 'Buenas')],
+                                transcript='Agent: Hola\nUser: Buenas', agent_name='Agente Ventas',
+                                call_analysis={'call_summary': 'Primera'})
+        self.Llamada._upsert_calls([self.Llamada._process_call_data(payload)])
+        llamada = self.Llamada.search([('call_id', '=', 'call_enriched_1')])
+        self.assertEqual(llamada.transcription, 'Agent: Hola\nUser: Buenas')
+
+        payload = self._payload('call_enriched_1', [], call_analysis={'call_summary': 'Segunda'})
+        del payload['transcript_object']
+        self.assertEqual(self.Llamada._upsert_calls([self.Llamada._process_call_data(payload)]), (0, 1))
+        self.assertEqual(llamada.description_llamada, 'Segunda')
+        self.assertEqual(llamada.agent_name, 'Agente Ventas')
+        self.assertEqual(llamada.transcription, 'Agent: Hola\nUser: Buenas')
+        self.assertEqual([turn['text'] for turn in llamada.transcript_turns], ['Hola', 'Buenas'])